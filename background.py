@@ -0,0 +1,87 @@
+"""
+Helper for running work off the Tk main thread.
+
+Tk widgets may only be touched from the thread running mainloop, so work
+functions post messages to a queue and the widget drains it with after().
+"""
+import queue
+import threading
+
+
+class TaskCancelled(Exception):
+    """Raised inside a work function when its task has been cancelled."""
+
+
+class BackgroundTask:
+    """
+    Run work(task) on a daemon thread and deliver its messages on the Tk thread.
+
+    The work function calls task.post(message) for each result it produces and
+    may call task.check_cancelled() between steps. On the Tk thread,
+    on_message(message) is called for each posted message and finally
+    on_done(error) once, where error is None on success, a TaskCancelled on
+    cancellation or the exception raised by work.
+    """
+    def __init__(self, widget, work, on_message=None, on_done=None, poll_ms=50, max_pending=16):
+        self.widget = widget
+        self.work = work
+        self.on_message = on_message
+        self.on_done = on_done
+        self.poll_ms = poll_ms
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._cancel = threading.Event()
+        self._finished = False
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self.widget.after(self.poll_ms, self._poll)
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise TaskCancelled()
+
+    def post(self, message):
+        """Queue a message for the Tk thread, waiting while the queue is full."""
+        while True:
+            self.check_cancelled()
+            try:
+                self._queue.put(message, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self):
+        try:
+            self.work(self)
+        except Exception as e:
+            self._error = e
+        self._finished = True
+
+    def _poll(self):
+        finished = self._finished
+        while True:
+            try:
+                message = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if self.on_message is not None and not self._cancel.is_set():
+                self.on_message(message)
+
+        if not finished:
+            self.widget.after(self.poll_ms, self._poll)
+            return
+        error = self._error
+        if error is None and self._cancel.is_set():
+            error = TaskCancelled()
+        if self.on_done is not None:
+            self.on_done(error)
@@ -0,0 +1,149 @@
+"""
+Batch generation of many candidate groupings across a process pool.
+
+Each scenario is one call to grouping_engine.generate_groups with an explicit
+seed, group count and minimum group size, so any scenario can be reproduced
+later from its seed. Scenarios are scored on how even the group sizes are and
+how many different roles each group has, and the best ones are returned.
+"""
+import heapq
+import os
+import random
+
+import grouping_engine
+from roster import Roster
+
+
+class Scenario:
+    """One scored grouping from a batch run."""
+    def __init__(self, seed, num_groups, min_group_size, result, score, size_variance, role_diversity):
+        self.seed = seed
+        self.num_groups = num_groups
+        self.min_group_size = min_group_size
+        self.result = result
+        self.score = score
+        self.size_variance = size_variance
+        self.role_diversity = role_diversity
+
+
+def score_groups(roster, groups, variance_weight=1.0):
+    """
+    Return (score, size_variance, role_diversity) for a grouping; higher scores are better.
+
+    size_variance is the population variance of the group sizes. role_diversity
+    is the average, over groups, of distinct roles divided by group size (1.0
+    when nobody in a group shares a role).
+    """
+    sizes = [len(group) for group in groups]
+    mean = sum(sizes) / len(sizes)
+    size_variance = sum((size - mean) ** 2 for size in sizes) / len(sizes)
+    role_ids = roster.role_ids
+    role_diversity = sum(
+        len({role_ids[index] for index in group}) / len(group) for group in groups if group
+    ) / len(groups)
+    return role_diversity - variance_weight * size_variance, size_variance, role_diversity
+
+
+# ---------------- WORKER PROCESS ----------------
+# The roster is sent to each worker once, through the pool initializer, rather
+# than with every task.
+_worker_roster = None
+_worker_options = None
+
+
+def _init_worker(names, role_ids, role_names, options):
+    global _worker_roster, _worker_options
+    _worker_roster = Roster.from_columns(names, role_ids, role_names)
+    _worker_options = options
+
+
+def _run_jobs(jobs, top_k):
+    """Run (seed, num_groups, min_group_size) jobs and keep the top_k by score."""
+    roster = _worker_roster
+    options = _worker_options
+    scored = []
+    for seed, num_groups, min_group_size in jobs:
+        try:
+            result = grouping_engine.generate_groups(
+                roster,
+                num_groups,
+                min_group_size,
+                require_writer=options["require_writer"],
+                require_dp=options["require_dp"],
+                rng=random.Random(seed),
+                constraints=options["constraints"],
+            )
+        except grouping_engine.GroupingError:
+            continue
+        score, size_variance, role_diversity = score_groups(
+            result.roster, result.groups, options["variance_weight"]
+        )
+        scored.append((score, -seed, seed, num_groups, min_group_size,
+                       result.groups, result.num_groups, result.notices, size_variance, role_diversity))
+    return heapq.nlargest(top_k, scored, key=lambda item: (item[0], item[1]))
+
+
+def generate_batch(roster, settings, seeds, top_k=5, require_writer=True, require_dp=True,
+                   constraints=None, variance_weight=1.0, max_workers=None, check_cancelled=None):
+    """
+    Generate one grouping per (seed, setting) pair and return the top_k Scenarios.
+
+    settings is a list of (num_groups, min_group_size) pairs. Work is spread
+    over a ProcessPoolExecutor with max_workers processes (default: one per
+    CPU); max_workers=1 runs everything in this process. Settings that cannot
+    form any group are skipped. Ties are broken by the lower seed.
+
+    check_cancelled, if given, is polled while waiting for the workers and
+    should raise to abandon the batch; chunks that have not started are dropped.
+    """
+    jobs = [(seed, num_groups, min_group_size) for seed in seeds for num_groups, min_group_size in settings]
+    if not jobs:
+        return []
+    options = {
+        "require_writer": require_writer,
+        "require_dp": require_dp,
+        "constraints": constraints,
+        "variance_weight": variance_weight,
+    }
+    init_args = (roster.names, roster.role_ids, roster.role_names, options)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(jobs))
+
+    if max_workers <= 1:
+        _init_worker(*init_args)
+        best = []
+        # Small slices so cancellation is noticed between them.
+        for start in range(0, len(jobs), 8):
+            if check_cancelled is not None:
+                check_cancelled()
+            best = heapq.nlargest(top_k, best + _run_jobs(jobs[start:start + 8], top_k),
+                                  key=lambda item: (item[0], item[1]))
+    else:
+        from concurrent.futures import ProcessPoolExecutor, wait
+
+        # A few chunks per worker keeps all processes busy without paying
+        # per-job pickling costs.
+        chunk_count = max_workers * 4
+        chunks = [jobs[i::chunk_count] for i in range(chunk_count) if jobs[i::chunk_count]]
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=init_args) as pool:
+            futures = [pool.submit(_run_jobs, chunk, top_k) for chunk in chunks]
+            pending = set(futures)
+            try:
+                while pending:
+                    if check_cancelled is not None:
+                        check_cancelled()
+                    _, pending = wait(pending, timeout=0.1)
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            candidates = [item for future in futures for item in future.result()]
+        best = heapq.nlargest(top_k, candidates, key=lambda item: (item[0], item[1]))
+
+    snapshot = roster.named()
+    scenarios = []
+    for (score, _, seed, num_groups, min_group_size, groups, result_groups,
+         notices, size_variance, role_diversity) in best:
+        result = grouping_engine.GroupingResult(snapshot, groups, result_groups, notices)
+        scenarios.append(Scenario(seed, num_groups, min_group_size, result, score, size_variance, role_diversity))
+    return scenarios
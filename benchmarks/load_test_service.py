@@ -0,0 +1,192 @@
+"""
+Load test for the local grouping service (service.py).
+
+Starts the service on a free localhost port (or uses --url / --socket),
+sends --requests requests from --concurrency keep-alive connections and
+prints throughput, latency percentiles and how the service batched them.
+Everything stays on this machine.
+
+    python benchmarks/load_test_service.py --requests 2000 --concurrency 50
+    python benchmarks/load_test_service.py --size 5000 --rosters 4 --by-hash
+    python benchmarks/load_test_service.py --url http://127.0.0.1:8765 -o load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from roles import ALL_ROLES  # noqa: E402
+
+
+def make_persons(size, seed):
+    rng = random.Random(seed)
+    persons = [[f"Person {seed}-{i}", rng.choice(ALL_ROLES)] for i in range(size)]
+    # Enough WRITERs and DPs for the default requirements.
+    for i in range(size // 10 + 1):
+        persons += [[f"Writer {seed}-{i}", "WRITER"], [f"DP {seed}-{i}", "DP"]]
+    return persons
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection to the service."""
+    def __init__(self, reader, writer, host):
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+
+    @classmethod
+    async def open(cls, url=None, socket_path=None):
+        if socket_path:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            return cls(reader, writer, "localhost")
+        parts = urlsplit(url)
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+        return cls(reader, writer, parts.netloc)
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+                          .encode("latin-1") + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, await self.reader.readexactly(length)
+
+    def close(self):
+        self.writer.close()
+
+
+async def run_load(args, url, socket_path):
+    rosters = [make_persons(args.size, seed) for seed in range(args.rosters)]
+    hashes = [None] * len(rosters)
+    if args.by_hash:
+        # Upload each roster once; later requests refer to it by hash.
+        connection = await Connection.open(url, socket_path)
+        for i, persons in enumerate(rosters):
+            status, body = await connection.request("POST", "/groups", {"persons": persons, "seed": 0})
+            if status != 200:
+                raise SystemExit(f"Uploading roster {i} failed ({status}): {body.decode('utf-8', 'replace')}")
+            hashes[i] = json.loads(body)["roster_hash"]
+        connection.close()
+
+    latencies = []
+    errors = 0
+    counter = iter(range(args.requests))
+
+    async def client(number):
+        nonlocal errors
+        connection = await Connection.open(url, socket_path)
+        rng = random.Random(number)
+        try:
+            for i in counter:
+                roster = i % len(rosters)
+                request = {"num_groups": rng.randint(2, max(2, args.size // 20)), "min_group_size": 2,
+                           "seed": rng.randrange(args.seeds) if args.seeds else None}
+                if hashes[roster] is not None:
+                    request["roster_hash"] = hashes[roster]
+                else:
+                    request["persons"] = rosters[roster]
+                start = time.perf_counter()
+                status, _ = await connection.request("POST", "/groups", request)
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors += 1
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    connection = await Connection.open(url, socket_path)
+    _, body = await connection.request("GET", "/health")
+    connection.close()
+    health = json.loads(body)
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        "p99_ms": 1000 * latencies[int(0.99 * (len(latencies) - 1))],
+        "service": health,
+    }
+
+
+def start_service(args):
+    """Start service.py on a free port; returns (process, url)."""
+    command = [sys.executable, os.path.join(APP_DIR, "service.py"), "--port", "0",
+               "--batch-window-ms", str(args.batch_window_ms)]
+    if args.workers:
+        command += ["--workers", str(args.workers)]
+    process = subprocess.Popen(command, stderr=subprocess.PIPE, text=True)
+    line = process.stderr.readline()
+    if not line.startswith("Listening on "):
+        process.kill()
+        raise SystemExit(f"The service did not start: {line.strip()}")
+    return process, line.split()[-1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the local Crew Maker grouping service.")
+    parser.add_argument("--url", default=None, help="use a running service at this URL")
+    parser.add_argument("--socket", default=None, help="use a running service on this Unix socket")
+    parser.add_argument("--requests", type=int, default=1000, help="total requests (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=32, help="parallel connections (default: %(default)s)")
+    parser.add_argument("--size", type=int, default=200, help="people per roster (default: %(default)s)")
+    parser.add_argument("--rosters", type=int, default=4, help="distinct rosters (default: %(default)s)")
+    parser.add_argument("--seeds", type=int, default=0,
+                        help="draw seeds from this many values, so results repeat (default: random)")
+    parser.add_argument("--by-hash", action="store_true", help="send roster_hash instead of the roster")
+    parser.add_argument("--workers", type=int, default=None, help="workers for a service started here")
+    parser.add_argument("--batch-window-ms", type=float, default=5.0,
+                        help="batch window for a service started here (default: %(default)s)")
+    parser.add_argument("-o", "--output", default=None, help="also write the summary as JSON here")
+    args = parser.parse_args(argv)
+
+    process = None
+    url = args.url
+    if url is None and args.socket is None:
+        process, url = start_service(args)
+    try:
+        summary = asyncio.run(run_load(args, url, args.socket))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    service = summary["service"]
+    print(f"{summary['requests']} requests in {summary['seconds']:.2f}s "
+          f"({summary['requests_per_second']:.0f}/s), {summary['errors']} errors", file=sys.stderr)
+    print(f"latency p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms, "
+          f"p99 {summary['p99_ms']:.1f} ms", file=sys.stderr)
+    print(f"service: {service['batches']} batches, {service['cache_hits']} cache hits, "
+          f"{service['workers']} workers", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
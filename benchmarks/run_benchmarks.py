@@ -0,0 +1,318 @@
+"""
+Reproducible performance benchmarks for Crew Maker.
+
+Generates synthetic rosters and times each stage separately: grouping (classic
+and with role rules), CSV parsing, roster CSV export, group export as text,
+gzipped CSV and JSON Lines and, when a display is available, populating and
+rendering the Tk widgets. Results
+are written as JSON so runs from different commits can be compared. Cold
+start is timed once per run, in fresh interpreters and reported as size 0:
+importing grouping_app and, with a display, the app's --startup-report.
+
+    python benchmarks/run_benchmarks.py --sizes 100,10000,1000000 -o before.json
+    python benchmarks/run_benchmarks.py -o after.json --compare before.json
+    python benchmarks/run_benchmarks.py --xvfb      # start Xvfb for the Tk stages
+
+Role mixes: "film" (mostly crew and actors, a few writers and DPs), "uniform"
+(every role in ALL_ROLES equally likely) or a custom "ROLE=weight,..." list.
+The writer and DP requirements are only on when the roster has a WRITER or DP.
+A stage whose groups cannot be formed at some size (GroupingError) is
+recorded as skipped, with the reason, instead of timed.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import grouping_engine  # noqa: E402
+from constraints import RoleConstraint  # noqa: E402
+from export import export_groups, write_groups_text, write_roster_csv  # noqa: E402
+from roles import ALL_ROLES  # noqa: E402
+from roster import Roster  # noqa: E402
+from roster_csv import read_csv  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000, 1000000]
+
+ROLE_MIXES = {
+    "film": {
+        "CREW": 30, "ACTOR": 20, "SUPPORTING ACTOR": 8, "EXTRA": 8, "WRITER": 6, "DP": 6,
+        "DIRECTOR": 3, "PRODUCER": 3, "GRIP": 4, "GAFFER": 3, "SOUND MIXER": 3, "EDITOR": 3,
+        "MAKEUP ARTIST": 3,
+    },
+    "uniform": {role: 1 for role in ALL_ROLES},
+}
+
+
+def parse_role_mix(text):
+    if text in ROLE_MIXES:
+        return ROLE_MIXES[text]
+    mix = {}
+    for part in text.split(","):
+        role, _, weight = part.partition("=")
+        mix[role.strip()] = float(weight or 1)
+    return mix
+
+
+def make_roster(size, role_mix, seed=0):
+    """Build a roster of size persons with roles drawn from role_mix (role -> weight)."""
+    rng = random.Random(seed)
+    roles = rng.choices(list(role_mix), weights=list(role_mix.values()), k=size)
+    return Roster((f"Person {i}", role) for i, role in enumerate(roles))
+
+
+def time_stage(function, repeat):
+    """Run function repeat times and return the list of durations in seconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+# ---------------- STAGES ----------------
+def grouping_options(roster):
+    """Return the generate_groups requirements for roster: only those its role mix can meet."""
+    return {"require_writer": roster.count("WRITER") > 0, "require_dp": roster.count("DP") > 0}
+
+
+def setup_groups(roster, num_groups):
+    """
+    Return a function that returns the groups the export and render stages use.
+
+    When they cannot be generated, the function raises the GroupingError
+    instead, so those stages are skipped.
+    """
+    try:
+        result = grouping_engine.generate_groups(roster, num_groups, 2, rng=random.Random(0),
+                                                 **grouping_options(roster))
+        result.check()
+    except grouping_engine.GroupingError as e:
+        error = e
+
+        def groups():
+            raise error
+    else:
+        def groups():
+            return result
+    return groups
+
+
+def headless_stages(roster, workdir):
+    """Yield (stage name, function) pairs that need no display."""
+    num_groups = max(2, min(500, len(roster) // 20))
+    options = grouping_options(roster)
+    rules = [RoleConstraint("DIRECTOR", minimum=1), RoleConstraint("ACTOR", maximum=50)]
+    csv_path = os.path.join(workdir, "roster.csv")
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        write_roster_csv(roster, f)
+    groups = setup_groups(roster, num_groups)
+
+    def grouping():
+        grouping_engine.generate_groups(roster, num_groups, 2, rng=random.Random(0), **options)
+
+    def grouping_rules():
+        grouping_engine.generate_groups(roster, num_groups, 2, rng=random.Random(0), constraints=rules, **options)
+
+    def csv_parse():
+        read_csv(csv_path)
+
+    def export_roster_csv():
+        with open(os.path.join(workdir, "out.csv"), "w", newline="", encoding="utf-8") as f:
+            write_roster_csv(roster, f)
+
+    def export_groups_text():
+        result = groups()
+        with open(os.path.join(workdir, "out.txt"), "w", encoding="utf-8") as f:
+            write_groups_text(result, f)
+
+    def export_groups_csv_gz():
+        export_groups(os.path.join(workdir, "groups.csv.gz"), groups())
+
+    def export_groups_jsonl():
+        export_groups(os.path.join(workdir, "groups.jsonl"), groups())
+
+    yield "grouping", grouping
+    yield "grouping_rules", grouping_rules
+    yield "csv_parse", csv_parse
+    yield "export_roster_csv", export_roster_csv
+    yield "export_groups_text", export_groups_text
+    yield "export_groups_csv_gz", export_groups_csv_gz
+    yield "export_groups_jsonl", export_groups_jsonl
+
+
+def tk_stages(roster):
+    """Return ([(stage name, function), ...], app) for populating and rendering the GUI."""
+    import grouping_app
+
+    app = grouping_app.GroupingApp()
+    app.withdraw()
+    app.update()
+    groups = setup_groups(roster, max(2, min(500, len(roster) // 20)))
+
+    def populate_persons():
+        app.roster.clear()
+        role_names = roster.role_names
+        app.roster.extend(zip(roster.names, (role_names[role_id] for role_id in roster.role_ids)))
+        app.persons_view.refresh()
+        app.update_idletasks()
+
+    def render_groups():
+        result = groups()
+        app.clear_generated_groups()
+        app.display_groups(result)
+        app.update_idletasks()
+
+    return [("tk_populate_persons", populate_persons), ("tk_render_groups", render_groups)], app
+
+
+def startup_stages(run_tk):
+    """Yield (stage name, function) pairs that time a cold start in a new interpreter."""
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def startup_import():
+        subprocess.run([sys.executable, "-c", "import grouping_app"], cwd=app_dir, check=True)
+
+    def tk_startup():
+        # Exits once the window is ready; the exit status only says whether the
+        # budget was met, so it is not checked here.
+        subprocess.run([sys.executable, "grouping_app.py", "--startup-report"], cwd=app_dir,
+                       stderr=subprocess.DEVNULL)
+
+    yield "startup_import", startup_import
+    if run_tk:
+        yield "tk_startup", tk_startup
+
+
+def start_xvfb():
+    """Start a virtual display if none is set. Returns the process, or None."""
+    if os.environ.get("DISPLAY") or shutil.which("Xvfb") is None:
+        return None
+    display = ":97"
+    process = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ["DISPLAY"] = display
+    return process
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path, out):
+    """Print each stage's median time relative to the same stage in a baseline file."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["stage"], r["size"], r["role_mix"]): r for r in json.load(f)["results"]}
+    out.write(f"{'stage':<22}{'size':>10}{'before':>12}{'after':>12}{'ratio':>8}\n")
+    for r in results:
+        old = baseline.get((r["stage"], r["size"], r["role_mix"]))
+        if old is None or "median" not in old or "median" not in r:
+            continue  # Not run, or skipped, in one of the two.
+        ratio = r["median"] / old["median"] if old["median"] else float("inf")
+        flag = "  <-- slower" if ratio > 1.1 else ""
+        out.write(f"{r['stage']:<22}{r['size']:>10}{old['median']:>12.5f}{r['median']:>12.5f}"
+                  f"{ratio:>8.2f}{flag}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Crew Maker performance benchmarks.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated roster sizes (default: %(default)s)")
+    parser.add_argument("--role-mix", default="film", help='"film", "uniform" or "ROLE=weight,..."')
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the median is reported")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic rosters")
+    parser.add_argument("--stages", default=None, help="comma-separated stage names to run (default: all)")
+    parser.add_argument("--no-tk", action="store_true", help="skip the Tk stages")
+    parser.add_argument("--tk-max-size", type=int, default=100000,
+                        help="largest roster used for the Tk stages (default: %(default)s)")
+    parser.add_argument("--xvfb", action="store_true", help="start Xvfb when no DISPLAY is set")
+    parser.add_argument("-o", "--output", default="-", help="JSON output file (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="print a comparison with an earlier JSON file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    role_mix = parse_role_mix(args.role_mix)
+    selected = set(args.stages.split(",")) if args.stages else None
+    xvfb = start_xvfb() if args.xvfb and not args.no_tk else None
+    run_tk = not args.no_tk and bool(os.environ.get("DISPLAY"))
+    if not args.no_tk and not run_tk:
+        print("No display available; skipping Tk stages (use --xvfb).", file=sys.stderr)
+
+    results = []
+
+    def run_stage(name, function, size):
+        if selected is not None and name not in selected:
+            return
+        try:
+            durations = time_stage(function, args.repeat)
+        except grouping_engine.GroupingError as e:
+            results.append({"stage": name, "size": size, "role_mix": args.role_mix, "skipped": e.message})
+            print(f"{name:<22}{size:>10}  skipped: {e.message}", file=sys.stderr)
+            return
+        results.append({
+            "stage": name,
+            "size": size,
+            "role_mix": args.role_mix,
+            "median": statistics.median(durations),
+            "min": min(durations),
+            "runs": durations,
+        })
+        print(f"{name:<22}{size:>10}{statistics.median(durations):>12.5f}s", file=sys.stderr)
+
+    try:
+        for name, function in startup_stages(run_tk):
+            run_stage(name, function, 0)
+        with tempfile.TemporaryDirectory() as workdir:
+            for size in sizes:
+                roster = make_roster(size, role_mix, args.seed)
+                stages = list(headless_stages(roster, workdir))
+                app = None
+                if run_tk and size <= args.tk_max_size:
+                    gui_stages, app = tk_stages(roster)
+                    stages.extend(gui_stages)
+                for name, function in stages:
+                    run_stage(name, function, size)
+                if app is not None:
+                    app.destroy()
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if args.compare:
+        compare(results, args.compare, sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+A precomputed, case-insensitive search index for autocomplete lists.
+
+Prefix matches come from a binary search over the sorted lowercase entries
+(a flat, cache-friendly stand-in for a prefix trie). Substring matches come
+from an n-gram index: every 1-, 2- and 3-character piece of every entry maps
+to the entries containing it, so a query only checks the entries listed under
+its rarest piece instead of scanning the whole list.
+"""
+from bisect import bisect_left
+from functools import lru_cache
+
+GRAM_SIZE = 3
+
+
+class CompletionIndex:
+    """Case-insensitive prefix and substring search over a fixed list of entries."""
+    def __init__(self, entries):
+        self.entries = sorted(set(entries), key=str.lower)
+        self._lower = [entry.lower() for entry in self.entries]
+        self._grams = {}
+        for i, text in enumerate(self._lower):
+            seen = set()
+            for size in range(1, GRAM_SIZE + 1):
+                for start in range(len(text) - size + 1):
+                    gram = text[start:start + size]
+                    if gram not in seen:
+                        seen.add(gram)
+                        self._grams.setdefault(gram, []).append(i)
+
+    def search(self, text, limit=None):
+        """
+        Return entries containing text, ignoring case: prefix matches first,
+        then other substring matches, each in sorted order, at most limit of them.
+        """
+        query = text.lower()
+        if not query:
+            return self.entries[:limit]
+
+        lower = self._lower
+        matches = []
+        i = bisect_left(lower, query)
+        while i < len(lower) and lower[i].startswith(query) and len(matches) != limit:
+            matches.append(self.entries[i])
+            i += 1
+        if len(matches) == limit:
+            return matches
+
+        size = min(GRAM_SIZE, len(query))
+        pieces = [query[start:start + size] for start in range(len(query) - size + 1)]
+        postings = [self._grams.get(piece, ()) for piece in pieces]
+        for i in min(postings, key=len):
+            if query in lower[i] and not lower[i].startswith(query):
+                matches.append(self.entries[i])
+                if len(matches) == limit:
+                    break
+        return matches
+
+
+@lru_cache(maxsize=8)
+def _shared_index(entries):
+    return CompletionIndex(entries)
+
+
+def shared_index(entries):
+    """Return the CompletionIndex for entries, building it once per distinct list."""
+    return _shared_index(tuple(entries))
@@ -0,0 +1,162 @@
+"""
+Per-role group constraints and the constraint-driven group assignment.
+
+A RoleConstraint says how many people with a role each group must have (at
+least `minimum`, at most `maximum`). Everyone in the roster is placed, and
+each group must reach the minimum group size.
+
+Feasibility would in general be a flow problem (roles -> groups with lower and
+upper bounds per edge, groups -> sink with a lower bound of min_group_size),
+but all groups share the same bounds, so the flow is feasible exactly when
+simple counting conditions hold for the number of groups G:
+
+    G * min_group_size <= total people
+    G * minimum        <= people with the role <= G * maximum   (each rule)
+
+Dealing every role round-robin across the groups, continuing where the
+previous role stopped, then meets all bounds at once: each group gets the
+floor or ceiling of count / G people of every role, and group sizes differ by
+at most one. That gives an O(n) assignment and an exact, per-constraint
+explanation whenever a configuration is infeasible.
+"""
+import math
+import random
+
+
+class RoleConstraint:
+    """At least `minimum` and at most `maximum` (None for no limit) of `role` per group."""
+    def __init__(self, role, minimum=0, maximum=None):
+        if minimum < 0:
+            raise ValueError(f"Minimum {role}s per group cannot be negative.")
+        if maximum is not None and maximum < minimum:
+            raise ValueError(f"Maximum {role}s per group cannot be less than the minimum.")
+        self.role = role
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def __repr__(self):
+        return f"RoleConstraint({self.role!r}, minimum={self.minimum!r}, maximum={self.maximum!r})"
+
+    def __eq__(self, other):
+        return (isinstance(other, RoleConstraint)
+                and (self.role, self.minimum, self.maximum) == (other.role, other.minimum, other.maximum))
+
+    def __hash__(self):
+        return hash((self.role, self.minimum, self.maximum))
+
+    def describe(self):
+        """Return the rule as text, e.g. "at most 3 ACTOR per group"."""
+        if self.maximum is None:
+            return f"at least {self.minimum} {self.role} per group"
+        if self.minimum == self.maximum:
+            return f"exactly {self.minimum} {self.role} per group"
+        if self.minimum == 0:
+            return f"at most {self.maximum} {self.role} per group"
+        return f"{self.minimum}-{self.maximum} {self.role} per group"
+
+
+class GroupRange:
+    """
+    The numbers of groups a roster can be split into under a set of constraints.
+
+    low and high are inclusive bounds; the range is empty when low > high.
+    low_reason and high_reason are the constraints that set each bound (None
+    means the bound comes from the minimum group size or the number of people).
+    """
+    def __init__(self, low, high, low_reason, high_reason):
+        self.low = low
+        self.high = high
+        self.low_reason = low_reason
+        self.high_reason = high_reason
+
+    def __bool__(self):
+        return self.low <= self.high
+
+    def __contains__(self, num_groups):
+        return self.low <= num_groups <= self.high
+
+
+def merge_constraints(constraints, require_writer=False, require_dp=False):
+    """
+    Combine explicit constraints with the classic WRITER/DP toggles.
+
+    A toggle adds "at least one per group" unless its role already has an
+    explicit constraint. Later constraints for the same role replace earlier ones.
+    """
+    merged = {}
+    if require_writer:
+        merged["WRITER"] = RoleConstraint("WRITER", minimum=1)
+    if require_dp:
+        merged["DP"] = RoleConstraint("DP", minimum=1)
+    for constraint in constraints:
+        merged[constraint.role] = constraint
+    return list(merged.values())
+
+
+def feasible_group_range(roster, min_group_size, constraints):
+    """Return the GroupRange of group counts for which every constraint can hold."""
+    total = len(roster)
+    low, low_reason = 1, None
+    high, high_reason = total // min_group_size, None
+    for constraint in constraints:
+        count = roster.count(constraint.role)
+        if constraint.minimum > 0 and count // constraint.minimum < high:
+            high, high_reason = count // constraint.minimum, constraint
+        if constraint.maximum is not None and count > 0:
+            needed = math.ceil(count / constraint.maximum) if constraint.maximum > 0 else math.inf
+            if needed > low:
+                low, low_reason = needed, constraint
+    return GroupRange(low, high, low_reason, high_reason)
+
+
+def explain_high(roster, min_group_size, num_groups, reason):
+    """Explain why num_groups is more groups than the roster can fill."""
+    if reason is None:
+        return f"Not enough people to form {num_groups} groups of size {min_group_size}."
+    count = roster.count(reason.role)
+    return (f"Not enough {reason.role}s to fill {num_groups} groups "
+            f"({count} available, rule: {reason.describe()}).")
+
+
+def explain_low(roster, num_groups, reason):
+    """Explain why num_groups is too few groups to place everyone."""
+    count = roster.count(reason.role)
+    if reason.maximum == 0:
+        return f"{count} {reason.role}s cannot be placed: groups may have no {reason.role}s."
+    return (f"{count} {reason.role}s do not fit into {num_groups} groups "
+            f"(rule: {reason.describe()}).")
+
+
+def assign_groups(roster, num_groups, constraints, rng=None):
+    """
+    Deal the roster into num_groups groups honouring constraints.
+
+    num_groups must be inside feasible_group_range. Constrained roles are dealt
+    first, in the order given, then everyone else as one shuffled pool. Returns
+    a list of groups, each a list of roster row indices.
+    """
+    if rng is None:
+        rng = random
+    groups = [[] for _ in range(num_groups)]
+    constrained = set()
+    offset = rng.randrange(num_groups)
+
+    def deal(members):
+        nonlocal offset
+        for k, index in enumerate(members):
+            groups[(offset + k) % num_groups].append(index)
+        offset = (offset + len(members)) % num_groups
+
+    for constraint in constraints:
+        role_id = roster.role_id(constraint.role)
+        if role_id in constrained:
+            continue
+        constrained.add(role_id)
+        members = list(roster.members(constraint.role))
+        rng.shuffle(members)
+        deal(members)
+
+    pool = [index for index, role_id in enumerate(roster.role_ids) if role_id not in constrained]
+    rng.shuffle(pool)
+    deal(pool)
+    return groups
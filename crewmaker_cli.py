@@ -0,0 +1,174 @@
+"""
+Command-line group generation for Crew Maker.
+
+Builds groups from a roster CSV without a display, for build servers, cron
+jobs and batch scripts. This module never imports tkinter, so it starts fast.
+
+    python crewmaker_cli.py roster.csv --groups 4 --min-size 3 --seed 42
+    python crewmaker_cli.py roster.csv -g 6 --rule "DIRECTOR:1" --rule "ACTOR:0:3" -o groups.txt
+    python crewmaker_cli.py roster.csv -g 8 --rounds 5 --seed 7   # needs NumPy
+    python crewmaker_cli.py roster.csv -g 500 -o groups.jsonl.gz     # JSON Lines, gzipped
+"""
+import argparse
+import random
+import sys
+
+import grouping_engine
+import perf
+from constraints import RoleConstraint
+from export import FORMATS, export_groups, format_for_path, open_export, write_groups, write_groups_text
+from roster import Roster
+from roster_csv import read_csv
+
+
+def parse_rule(text):
+    """Parse ROLE:MIN[:MAX] (e.g. "DIRECTOR:1" or "ACTOR:0:3") into a RoleConstraint."""
+    parts = text.split(":")
+    if not 2 <= len(parts) <= 3:
+        raise argparse.ArgumentTypeError(f"invalid rule {text!r}: expected ROLE:MIN[:MAX]")
+    try:
+        role = parts[0].strip()
+        minimum = int(parts[1])
+        maximum = int(parts[2]) if len(parts) > 2 and parts[2].strip() else None
+        return RoleConstraint(role, minimum=minimum, maximum=maximum)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"invalid rule {text!r}: {e}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="crewmaker",
+        description="Generate random groups from a roster CSV (name, role per line)."
+    )
+    parser.add_argument("roster", help="roster CSV file")
+    parser.add_argument("-g", "--groups", type=int, default=2, help="number of groups (default: 2)")
+    parser.add_argument("-m", "--min-size", type=int, default=2, help="minimum group size (default: 2)")
+    parser.add_argument("--require-writer", action=argparse.BooleanOptionalAction, default=True,
+                        help="require one WRITER per group (default: on)")
+    parser.add_argument("--require-dp", action=argparse.BooleanOptionalAction, default=True,
+                        help="require one DP per group (default: on)")
+    parser.add_argument("--rule", type=parse_rule, action="append", default=[], metavar="ROLE:MIN[:MAX]",
+                        help="per-group role rule, may be repeated (e.g. DIRECTOR:1, ACTOR:0:3)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible groups")
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="generate this many seeded groupings and keep the most balanced one")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse results for the same roster, settings and seed from this directory")
+    parser.add_argument("--rounds", type=int, default=1,
+                        help="schedule this many rounds, avoiding repeat pairings (requires NumPy)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="output file, gzipped if it ends in .gz (default: stdout)")
+    parser.add_argument("-f", "--format", choices=FORMATS, default=None,
+                        help="output format (default: from the output file's extension, otherwise text)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    perf.enable_from_environment()
+    try:
+        return run(args)
+    finally:
+        perf.finish(sys.stderr)
+
+
+def run(args):
+    if args.format is None:
+        args.format = format_for_path(args.output) if args.output != "-" else "text"
+    if args.rounds > 1 and args.format != "text":
+        print("Error: --rounds only writes the text format.", file=sys.stderr)
+        return 2
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+
+    try:
+        with perf.span("csv.parse") as span:
+            roster = Roster(read_csv(args.roster))
+            span.add(len(roster))
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Import Error: {e}", file=sys.stderr)
+        return 2
+
+    options = {
+        "require_writer": args.require_writer,
+        "require_dp": args.require_dp,
+        "constraints": args.rule,
+    }
+    if args.rounds > 1:
+        return run_rounds(args, roster, seed, options)
+
+    cache = key = result = None
+    if args.cache_dir:
+        from result_cache import ResultCache, cache_key, roster_fingerprint
+
+        cache = ResultCache(directory=args.cache_dir)
+        key = cache_key(roster_fingerprint(roster.named()), args.groups, args.min_size, seed=seed,
+                        candidates=args.candidates, **options)
+        result = cache.get(key)
+    cached = result is not None
+    if result is None and args.candidates > 1:
+        import batch
+
+        rng = random.Random(seed)
+        seeds = [rng.randrange(2 ** 32) for _ in range(args.candidates)]
+        with perf.span("generate.batch"):
+            scenarios = batch.generate_batch(roster, [(args.groups, args.min_size)], seeds, top_k=1, **options)
+        if scenarios:
+            result = scenarios[0].result
+    try:
+        if result is None:
+            with perf.span("generate"):
+                result = grouping_engine.generate_groups(
+                    roster, args.groups, args.min_size, rng=random.Random(seed), **options
+                )
+    except grouping_engine.GroupingError as e:
+        print(f"{e.title}: {e.message}", file=sys.stderr)
+        return 1
+    if cache is not None and not cached:
+        cache.put(key, result)
+
+    for notice in result.notices:
+        print(f"Info: {notice}", file=sys.stderr)
+    print(f"Seed: {seed}", file=sys.stderr)
+
+    with perf.span("export"):
+        if args.output == "-":
+            write_groups(result, sys.stdout, args.format)
+        else:
+            export_groups(args.output, result, args.format)
+    return 0
+
+
+def run_rounds(args, roster, seed, options):
+    """Write a multi-round schedule, one "Round k:" section per round."""
+    try:
+        import rounds
+        schedule = rounds.schedule_rounds(roster, args.rounds, args.groups, args.min_size, seed=seed, **options)
+    except ImportError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    except grouping_engine.GroupingError as e:
+        print(f"{e.title}: {e.message}", file=sys.stderr)
+        return 1
+
+    for notice in schedule.results[0].notices:
+        print(f"Info: {notice}", file=sys.stderr)
+    print(f"Seed: {seed}", file=sys.stderr)
+    print(f"Repeat pairings per round: {', '.join(map(str, schedule.repeat_pairs))}", file=sys.stderr)
+
+    def write(f):
+        for number, result in enumerate(schedule.results, start=1):
+            if number > 1:
+                f.write("\n")
+            f.write(f"Round {number}:\n")
+            write_groups_text(result, f)
+
+    if args.output == "-":
+        write(sys.stdout)
+    else:
+        with open_export(args.output) as f:
+            write(f)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
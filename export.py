@@ -0,0 +1,186 @@
+"""
+Writers for generated groups and rosters.
+
+These read from a GroupingResult or Roster rather than from widgets, so the GUI, the
+command line and scripts all produce identical files.
+
+Groups and rosters can be written in three formats:
+
+    text   "Group 1:", "name - role" per member, blank line (rosters: "name - role")
+    csv    group,name,role with a header row (rosters: name,role, no header, as read by Import CSV)
+    jsonl  one JSON object per line: {"group": 1, "name": ..., "role": ...}
+
+Rows are formatted a chunk at a time and each chunk is handed to the file in
+one write, so memory use does not grow with the number of rows. export_groups
+and export_roster open the file themselves, gzip it when the name ends in .gz
+and only replace an existing file once the export has finished.
+"""
+import csv
+import gzip
+import io
+import os
+from itertools import islice
+from json.encoder import encode_basestring
+
+FORMATS = ("text", "csv", "jsonl")
+_EXTENSIONS = {".txt": "text", ".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+CHUNK_ROWS = 16384
+_BUFFER_SIZE = 1 << 20
+
+
+# ---------------- WRITERS ----------------
+def write_groups(result, f, format="text", check_cancelled=None, progress=None):
+    """
+    Write every group of result to the text file f in format.
+
+    check_cancelled() is called and progress(rows_written) reported after
+    each chunk, for running on a worker thread.
+    """
+    if format == "text":
+        rows = _group_text_lines(result)
+    elif format == "csv":
+        f.write("group,name,role\r\n")
+        rows = _group_members(result)
+    elif format == "jsonl":
+        rows = _jsonl_lines(_group_members(result), group=True)
+    else:
+        raise ValueError(f"unknown export format {format!r}; expected one of {', '.join(FORMATS)}")
+    _write_chunks(rows, f, format == "csv", check_cancelled, progress)
+
+
+def write_roster(roster, f, format="csv", check_cancelled=None, progress=None):
+    """Write every person in roster to the text file f in format (see write_groups)."""
+    role_names = roster.role_names
+    persons = ((name.strip(), role_names[role_id]) for name, role_id in zip(roster.names, roster.role_ids))
+    if format == "text":
+        rows = (f"{name} - {role}\n" for name, role in persons)
+    elif format == "csv":
+        rows = persons
+    elif format == "jsonl":
+        rows = _jsonl_lines(((None, name, role) for name, role in persons), group=False)
+    else:
+        raise ValueError(f"unknown export format {format!r}; expected one of {', '.join(FORMATS)}")
+    _write_chunks(rows, f, format == "csv", check_cancelled, progress)
+
+
+def write_roster_csv(roster, f):
+    """Write the roster as two-column CSV (name, role), the format read by Import/Load CSV."""
+    write_roster(roster, f, "csv")
+
+
+def write_groups_text(result, f):
+    """Write groups in the plain-text layout ("Group 1:", "name - role", blank line)."""
+    write_groups(result, f, "text")
+
+
+def _group_members(result):
+    """Yield (group number, name, role) for every member, group by group."""
+    names = result.roster.names
+    role_names = result.roster.role_names
+    role_ids = result.roster.role_ids
+    for number, group in enumerate(result.groups, start=1):
+        for index in group:
+            yield number, names[index], role_names[role_ids[index]]
+
+
+def _group_text_lines(result):
+    names = result.roster.names
+    role_names = result.roster.role_names
+    role_ids = result.roster.role_ids
+    for number, group in enumerate(result.groups, start=1):
+        yield f"Group {number}:\n"
+        for index in group:
+            yield f"{names[index]} - {role_names[role_ids[index]]}\n"
+        yield "\n"
+
+
+def _jsonl_lines(members, group):
+    # Roles repeat on every row, so each is encoded once.
+    roles = {}
+    for number, name, role in members:
+        encoded_role = roles.get(role)
+        if encoded_role is None:
+            encoded_role = roles[role] = encode_basestring(role)
+        if group:
+            yield f'{{"group": {number}, "name": {encode_basestring(name)}, "role": {encoded_role}}}\n'
+        else:
+            yield f'{{"name": {encode_basestring(name)}, "role": {encoded_role}}}\n'
+
+
+def _write_chunks(rows, f, as_csv, check_cancelled, progress):
+    # csv.writer calls write() once per row, so CSV chunks are formatted into
+    # a StringIO first.
+    buffer = io.StringIO() if as_csv else None
+    writer = csv.writer(buffer) if as_csv else None
+    written = 0
+    while True:
+        chunk = list(islice(rows, CHUNK_ROWS))
+        if not chunk:
+            break
+        if check_cancelled is not None:
+            check_cancelled()
+        if writer is not None:
+            writer.writerows(chunk)
+            f.write(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            f.write("".join(chunk))
+        written += len(chunk)
+        if progress is not None:
+            progress(written)
+
+
+# ---------------- FILES ----------------
+def format_for_path(path, default="text"):
+    """Return the export format implied by path's extension (ignoring .gz), or default."""
+    root, extension = os.path.splitext(path.lower())
+    if extension == ".gz":
+        extension = os.path.splitext(root)[1]
+    return _EXTENSIONS.get(extension, default)
+
+
+def open_export(path, compress=None):
+    """
+    Open path for writing an export as UTF-8 text with a large buffer.
+
+    The output is gzipped when compress is true, or when compress is None and
+    path ends in .gz.
+    """
+    if compress is None:
+        compress = path.lower().endswith(".gz")
+    if compress:
+        # Level 6 is several times faster than the default 9 for a few percent in size.
+        return gzip.open(path, "wt", compresslevel=6, encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="", buffering=_BUFFER_SIZE)
+
+
+def export_groups(path, result, format=None, compress=None, check_cancelled=None, progress=None):
+    """Write result's groups to path; format defaults to the one implied by the file name."""
+    _export(path, compress, lambda f: write_groups(result, f, format or format_for_path(path, "text"),
+                                                   check_cancelled, progress))
+
+
+def export_roster(path, roster, format=None, compress=None, check_cancelled=None, progress=None):
+    """Write roster to path; format defaults to the one implied by the file name (CSV otherwise)."""
+    _export(path, compress, lambda f: write_roster(roster, f, format or format_for_path(path, "csv"),
+                                                   check_cancelled, progress))
+
+
+def _export(path, compress, write):
+    # Written next to path and moved into place, so a failed or cancelled
+    # export leaves any earlier file intact.
+    temp_path = f"{path}.tmp"
+    try:
+        if compress is None:
+            compress = path.lower().endswith(".gz")
+        with open_export(temp_path, compress) as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
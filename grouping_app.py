@@ -1,50 +1,26 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-import csv
-import random
-
-# A comprehensive list of roles
-ALL_ROLES = [
-    "DIRECTOR",
-    "PRODUCER",
-    "ASSOCIATE PRODUCER",
-    "EXECUTIVE PRODUCER",
-    "WRITER",
-    "SCREENWRITER",
-    "STORY DEVELOPER",
-    "DP",
-    "CAMERAMAN",
-    "GAFFER",
-    "BEST BOY",
-    "GRIP",
-    "KEY GRIP",
-    "ELECTRICIAN",
-    "SOUND MIXER",
-    "SOUND DESIGNER",
-    "SOUND RECORDIST",
-    "MAKEUP ARTIST",
-    "HAIR STYLIST",
-    "COSTUME DESIGNER",
-    "COSTUMER",
-    "ACTOR",
-    "SUPPORTING ACTOR",
-    "EXTRA",
-    "SCRIPT SUPERVISOR",
-    "ART DIRECTOR",
-    "PRODUCTION DESIGNER",
-    "SET DECORATOR",
-    "LOCATION MANAGER",
-    "PRODUCTION ASSISTANT",
-    "STUNT COORDINATOR",
-    "CHOREOGRAPHER",
-    "VISUAL EFFECTS SUPERVISOR",
-    "EDITOR",
-    "POST-PRODUCTION SUPERVISOR",
-    "COLORIST",
-    "COMPOSER",
-    "MUSIC SUPERVISOR",
-    "CREW"
-]
+import time
+
+_IMPORT_START = time.perf_counter()  # For the startup report.
+
+import tkinter as tk  # noqa: E402
+from tkinter import ttk, messagebox  # noqa: E402
+import tkinter.font as tkfont  # noqa: E402
+from bisect import bisect_right  # noqa: E402
+import sys  # noqa: E402
+
+import perf  # noqa: E402
+from roles import ALL_ROLES  # noqa: E402
+from roster import Roster  # noqa: E402
+from completion_index import shared_index  # noqa: E402
+from background import BackgroundTask, TaskCancelled  # noqa: E402
+
+# Cold start (module import to a usable window) should stay under this; see
+# main() and the startup report.
+STARTUP_BUDGET_MS = 1000
+
+# Everything else (grouping, CSV, sessions, caching, file dialogs, the process
+# pool) is imported where it is first used, so the window can appear before
+# those modules have loaded.
 
 
 class AutocompleteCombobox(ttk.Combobox):
@@ -52,36 +28,63 @@ class AutocompleteCombobox(ttk.Combobox):
     A ttk.Combobox with autocomplete functionality.
     As the user types, the drop-down list is filtered to show matching roles.
     If no match is found, a placeholder ("No match found") is shown.
+
+    Filtering uses a CompletionIndex shared by every combobox with the same
+    list, runs once typing pauses, and shows at most MAX_MATCHES entries. The
+    index is built the first time someone types, not when the box is created.
     """
+    MAX_MATCHES = 100
+    DEBOUNCE_MS = 100
+
     def __init__(self, master=None, **kwargs):
         kwargs.setdefault("state", "normal")
         super().__init__(master, **kwargs)
-        self._completion_list = []
+        self._completion_list = ()
+        self._shown = None
+        self._filter_job = None
         self.bind('<KeyRelease>', self.handle_keyrelease)
 
     def set_completion_list(self, completion_list):
-        self._completion_list = sorted(completion_list, key=str.lower)
-        self['values'] = self._completion_list
+        self._completion_list = tuple(completion_list)
+        self._show(sorted(set(self._completion_list), key=str.lower)[:self.MAX_MATCHES])
+
+    def _show(self, values):
+        # Only hand Tk a new list when it actually changed.
+        values = tuple(values)
+        if values != self._shown:
+            self._shown = values
+            self['values'] = values
 
     def handle_keyrelease(self, event):
         if event.keysym in ("Left", "Right", "Up", "Down", "Return", "Escape", "Tab"):
             return
-        text = self.get()
-        if text == "":
-            self['values'] = self._completion_list
-        else:
-            filtered = [item for item in self._completion_list if text.lower() in item.lower()]
-            if filtered:
-                self['values'] = filtered
-            else:
-                self['values'] = ["No match found"]
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(self.DEBOUNCE_MS, self._filter)
+
+    def _filter(self):
+        self._filter_job = None
+        filtered = shared_index(self._completion_list).search(self.get(), limit=self.MAX_MATCHES)
+        self._show(filtered or ["No match found"])
 
 
 class PersonRow(tk.Frame):
-    """A row widget representing one person with an editable name and a searchable role dropdown."""
-    def __init__(self, master, remove_callback, **kwargs):
+    """
+    A row widget showing one person with an editable name and a searchable role dropdown.
+
+    Rows are recycled by PersonListView: bind_index points the row at a roster
+    entry and edits are reported back through edit_callback(index, name, role).
+    Name edits are reported as they are typed (with role None); a role only
+    once it is chosen from the list, confirmed with Enter or left, so
+    half-typed roles never reach the roster.
+    """
+    def __init__(self, master, remove_callback, edit_callback=None, **kwargs):
         super().__init__(master, **kwargs)
         self.remove_callback = remove_callback
+        self.edit_callback = edit_callback
+        self.index = None
+        self._binding = False
+        self._role = None  # The role last bound or reported for index.
         self.name_var = tk.StringVar()
         self.role_var = tk.StringVar(value="CREW")
 
@@ -95,6 +98,43 @@ class PersonRow(tk.Frame):
         self.remove_button = ttk.Button(self, text="Remove", command=self.remove_self)
         self.remove_button.grid(row=0, column=2, padx=5, pady=5)
 
+        self.name_var.trace_add("write", self._on_edit)
+        for sequence in ("<<ComboboxSelected>>", "<Return>", "<FocusOut>"):
+            self.combobox_role.bind(sequence, self._commit_role, add="+")
+        self._normal_bg = self.cget("bg")
+        self._highlighted = False
+
+    def set_highlight(self, on):
+        """Mark the row, e.g. as the current search match."""
+        if on != self._highlighted:
+            self._highlighted = on
+            self.configure(bg="lightyellow" if on else self._normal_bg)
+
+    def bind_index(self, index, name, role):
+        """Show the roster entry at index without reporting it as an edit."""
+        self.index = index
+        self._role = role
+        self._binding = True
+        try:
+            if self.name_var.get() != name:
+                self.name_var.set(name)
+            if self.role_var.get() != role:
+                self.role_var.set(role)
+        finally:
+            self._binding = False
+
+    def _on_edit(self, *args):
+        if self._binding or self.index is None or self.edit_callback is None:
+            return
+        self.edit_callback(self.index, self.name_var.get(), None)
+
+    def _commit_role(self, event=None):
+        role = self.role_var.get()
+        if self.index is None or self.edit_callback is None or role == self._role:
+            return
+        self._role = role
+        self.edit_callback(self.index, self.name_var.get(), role)
+
     def remove_self(self):
         if messagebox.askyesno("Remove Person", "Are you sure you want to remove this person?"):
             self.remove_callback(self)
@@ -106,8 +146,419 @@ class PersonRow(tk.Frame):
         }
 
 
+class PersonListView(tk.Frame):
+    """
+    A scrollable persons list that only has widgets for the rows on screen.
+
+    A pool of PersonRow widgets, one per visible line, is re-bound to roster
+    indices as the list scrolls, so the widget count does not grow with the
+    roster. Call refresh() after changing the roster; edits made in the rows
+    are written to the roster and reported through change_callback().
+    """
+    def __init__(self, master, roster, remove_callback, change_callback=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.roster = roster
+        self.remove_callback = remove_callback
+        self.change_callback = change_callback
+        self.first = 0
+        self.highlight = None  # Row index shown highlighted (the current search match).
+        self.row_height = None
+        self.pool = []
+
+        self.body = tk.Frame(self)
+        self.body.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.body.bind("<Configure>", lambda e: self.refresh())
+        self.body.bind("<Enter>", lambda e: self.body.bind_all("<MouseWheel>", self._on_mousewheel))
+        self.body.bind("<Leave>", lambda e: self.body.unbind_all("<MouseWheel>"))
+
+    def _new_row(self):
+        with perf.span("persons.new_row"):
+            row = PersonRow(self.body, remove_callback=self.remove_callback, edit_callback=self._on_row_edit)
+            if self.row_height is None:
+                row.update_idletasks()
+                self.row_height = row.winfo_reqheight() + 4
+            self.pool.append(row)
+        perf.gauge("persons.row_widgets", len(self.pool))
+        return row
+
+    def visible_count(self):
+        if self.row_height is None:
+            return 1
+        return max(1, self.body.winfo_height() // self.row_height)
+
+    def refresh(self):
+        with perf.span("persons.refresh"):
+            self._refresh()
+
+    def _refresh(self):
+        total = len(self.roster)
+        if total and not self.pool:
+            self._new_row()
+        count = self.visible_count()
+        self.first = max(0, min(self.first, total - count))
+        while len(self.pool) < min(count, total):
+            self._new_row()
+
+        for slot, row in enumerate(self.pool):
+            index = self.first + slot
+            if slot < count and index < total:
+                row.bind_index(index, self.roster.names[index], self.roster.role(index))
+                row.set_highlight(index == self.highlight)
+                row.place(x=0, y=slot * self.row_height, relwidth=1, height=self.row_height)
+            else:
+                row.index = None
+                row.place_forget()
+
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + count) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", n, "units"|"pages")."""
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * len(self.roster))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_count()
+            self.first += amount
+        self.refresh()
+
+    def scroll_to_end(self):
+        self.first = len(self.roster)
+        self.refresh()
+
+    def show_row(self, index):
+        """Scroll index into the middle of the view and highlight it (None clears the highlight)."""
+        self.highlight = index
+        if index is not None and not self.first <= index < self.first + self.visible_count():
+            self.first = index - self.visible_count() // 2
+        self.refresh()
+
+    def _on_mousewheel(self, event):
+        self.yview("scroll", int(-1 * (event.delta / 120)), "units")
+
+    def _on_row_edit(self, index, name, role):
+        self.roster.set_name(index, name)
+        if role is not None:
+            self.roster.set_role(index, role)
+        if self.change_callback is not None:
+            self.change_callback()
+
+
+class GroupsView(tk.Frame):
+    """
+    Draws the generated groups onto one canvas, only for the part in view.
+
+    Each group is a box with a title and its members as text, split into chunks
+    of CHUNK_LINES lines. Only the items inside the visible area (plus a margin)
+    exist on the canvas. set_result() lays out the new groups and reuses what is
+    already drawn: unchanged items are moved if needed, changed text is updated
+    in place and items that leave the view are deleted.
+    """
+    CHUNK_LINES = 50
+    PAD = 10
+    GAP = 10
+    MARGIN = 200
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.canvas = tk.Canvas(self, borderwidth=0, highlightthickness=0)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<Enter>", lambda e: self.canvas.bind_all("<MouseWheel>", self._on_mousewheel))
+        self.canvas.bind("<Leave>", lambda e: self.canvas.unbind_all("<MouseWheel>"))
+
+        self.title_font = tkfont.Font(family="Helvetica", size=12, weight="bold")
+        self.text_font = tkfont.Font(family="Helvetica", size=10)
+        self.title_height = self.title_font.metrics("linespace")
+        self.line_height = self.text_font.metrics("linespace")
+
+        self.result = None
+        self._tops = []  # Top y of each group's box.
+        self._items = {}  # Key -> [canvas item id, coords, text].
+
+    def set_result(self, result):
+        self.result = result
+        tops = []
+        y = self.GAP
+        for group in result.groups:
+            tops.append(y)
+            y += self._group_height(group) + self.GAP
+        self._tops = tops
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), y))
+        self.redraw()
+
+    def clear(self):
+        self.canvas.delete("all")
+        self._items.clear()
+        self._tops = []
+        self.result = None
+        self.canvas.configure(scrollregion=(0, 0, 0, 0))
+
+    def _group_height(self, group):
+        return self.PAD + self.title_height + self.PAD // 2 + len(group) * self.line_height + self.PAD
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.redraw()
+
+    def _on_mousewheel(self, event):
+        self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+        self.redraw()
+
+    def redraw(self):
+        if self.result is None:
+            return
+        with perf.span("groups.redraw"):
+            self._redraw()
+        perf.gauge("groups.canvas_items", len(self._items))
+
+    def _redraw(self):
+        wanted = self._visible_items()
+        for key in [key for key in self._items if key not in wanted]:
+            self.canvas.delete(self._items.pop(key)[0])
+        for key, (kind, coords, text) in wanted.items():
+            item = self._items.get(key)
+            if item is None:
+                if kind == "box":
+                    item_id = self.canvas.create_rectangle(*coords, outline="gray60")
+                else:
+                    font = self.title_font if kind == "title" else self.text_font
+                    item_id = self.canvas.create_text(*coords, text=text, anchor="nw", font=font)
+                self._items[key] = [item_id, coords, text]
+                continue
+            if item[1] != coords:
+                self.canvas.coords(item[0], *coords)
+                item[1] = coords
+            if item[2] != text:
+                self.canvas.itemconfigure(item[0], text=text)
+                item[2] = text
+
+    def _visible_items(self):
+        """Return {key: (kind, coords, text)} for everything that should be drawn now."""
+        canvas = self.canvas
+        top = canvas.canvasy(0) - self.MARGIN
+        bottom = canvas.canvasy(canvas.winfo_height()) + self.MARGIN
+        right = max(canvas.winfo_width() - 5, 100)
+        x = 5 + self.PAD
+        groups = self.result.groups
+        wanted = {}
+
+        g = max(0, bisect_right(self._tops, top) - 1)
+        while g < len(groups) and self._tops[g] < bottom:
+            group = groups[g]
+            box_top = self._tops[g]
+            box_bottom = box_top + self._group_height(group)
+            if box_bottom >= top:
+                wanted[("box", g)] = ("box", (5, box_top, right, box_bottom), None)
+                wanted[("title", g)] = ("title", (x, box_top + self.PAD), f"Group {g + 1}")
+                lines_top = box_top + self.PAD + self.title_height + self.PAD // 2
+                chunk_height = self.CHUNK_LINES * self.line_height
+                first = max(0, int((top - lines_top) // chunk_height))
+                last = min((len(group) - 1) // self.CHUNK_LINES, int((bottom - lines_top) // chunk_height))
+                for c in range(first, last + 1):
+                    start = c * self.CHUNK_LINES
+                    members = self.result.members(group[start:start + self.CHUNK_LINES])
+                    text = "\n".join(f"{name} - {role}" for name, role in members)
+                    wanted[("chunk", g, c)] = ("chunk", (x, lines_top + c * chunk_height), text)
+            g += 1
+        return wanted
+
+
+class RoleRulesDialog(tk.Toplevel):
+    """A dialog for editing per-role minimum and maximum counts per group."""
+    def __init__(self, master, constraints, on_save):
+        super().__init__(master)
+        self.title("Role Rules")
+        self.transient(master)
+        self.on_save = on_save
+        self.constraints = {c.role: c for c in constraints}
+
+        self.tree = ttk.Treeview(self, columns=("role", "min", "max"), show="headings", height=10)
+        self.tree.heading("role", text="Role")
+        self.tree.heading("min", text="Min per group")
+        self.tree.heading("max", text="Max per group")
+        self.tree.column("role", width=220)
+        self.tree.column("min", width=100, anchor="center")
+        self.tree.column("max", width=100, anchor="center")
+        self.tree.grid(row=0, column=0, columnspan=4, sticky="nsew", padx=10, pady=10)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+
+        self.role_var = tk.StringVar(value="ACTOR")
+        self.min_var = tk.StringVar(value="0")
+        self.max_var = tk.StringVar(value="")
+        tk.Label(self, text="Role:", font=("Helvetica", 10)).grid(row=1, column=0, padx=5, pady=5, sticky="e")
+        role_box = AutocompleteCombobox(self, textvariable=self.role_var, width=25, font=("Helvetica", 10))
+        role_box.set_completion_list(ALL_ROLES)
+        role_box.grid(row=1, column=1, columnspan=3, padx=5, pady=5, sticky="w")
+        tk.Label(self, text="Min:", font=("Helvetica", 10)).grid(row=2, column=0, padx=5, pady=5, sticky="e")
+        tk.Spinbox(self, from_=0, to=100, width=5, textvariable=self.min_var, font=("Helvetica", 10)) \
+            .grid(row=2, column=1, padx=5, pady=5, sticky="w")
+        tk.Label(self, text="Max (blank = no limit):", font=("Helvetica", 10)) \
+            .grid(row=2, column=2, padx=5, pady=5, sticky="e")
+        tk.Entry(self, textvariable=self.max_var, width=6, font=("Helvetica", 10)) \
+            .grid(row=2, column=3, padx=5, pady=5, sticky="w")
+
+        buttons = ttk.Frame(self)
+        buttons.grid(row=3, column=0, columnspan=4, pady=10)
+        ttk.Button(buttons, text="Add / Update", command=self.add_rule).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Remove", command=self.remove_rule).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Save", command=self.save).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Cancel", command=self.destroy).pack(side="left", padx=5)
+
+        self.refresh()
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for constraint in self.constraints.values():
+            maximum = "" if constraint.maximum is None else constraint.maximum
+            self.tree.insert("", "end", iid=constraint.role, values=(constraint.role, constraint.minimum, maximum))
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            constraint = self.constraints[selection[0]]
+            self.role_var.set(constraint.role)
+            self.min_var.set(str(constraint.minimum))
+            self.max_var.set("" if constraint.maximum is None else str(constraint.maximum))
+
+    def add_rule(self):
+        role = self.role_var.get().strip()
+        if not role:
+            messagebox.showerror("Rule Error", "Please choose a role.", parent=self)
+            return
+        from constraints import RoleConstraint
+
+        try:
+            minimum = int(self.min_var.get())
+            maximum = int(self.max_var.get()) if self.max_var.get().strip() else None
+            self.constraints[role] = RoleConstraint(role, minimum=minimum, maximum=maximum)
+        except ValueError as e:
+            messagebox.showerror("Rule Error", f"Invalid rule for {role}:\n{e}", parent=self)
+            return
+        self.refresh()
+
+    def remove_rule(self):
+        for role in self.tree.selection():
+            self.constraints.pop(role, None)
+        self.refresh()
+
+    def save(self):
+        self.on_save(list(self.constraints.values()))
+        self.destroy()
+
+
+class PerfPanel(tk.Toplevel):
+    """Shows the perf module's timings, counters and memory use, refreshed every second."""
+    REFRESH_MS = 1000
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Performance")
+        self.geometry("720x420")
+
+        self.enabled_var = tk.IntVar(value=int(perf.enabled))
+        self.memory_var = tk.IntVar(value=int(perf.memory_tracing()))
+        controls = ttk.Frame(self)
+        controls.pack(fill="x", padx=10, pady=(10, 5))
+        ttk.Checkbutton(controls, text="Instrumentation", variable=self.enabled_var,
+                        command=self.toggle).pack(side="left", padx=5)
+        ttk.Checkbutton(controls, text="Track memory", variable=self.memory_var,
+                        command=self.toggle).pack(side="left", padx=5)
+        self.profile_button = ttk.Button(controls, command=self.toggle_profile)
+        self.profile_button.pack(side="left", padx=5)
+        ttk.Button(controls, text="Reset", command=self.reset).pack(side="left", padx=5)
+        ttk.Button(controls, text="Save Report...", command=self.save_report).pack(side="left", padx=5)
+
+        self.text = tk.Text(self, font=("Courier", 9), wrap="none", state="disabled")
+        self.text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self.showing_profile = False
+        self._tick_job = None
+        self._tick()
+
+    def toggle(self):
+        if self.enabled_var.get():
+            perf.enable()
+        else:
+            perf.disable()
+            self.memory_var.set(0)
+        perf.trace_memory(bool(self.memory_var.get()))
+        self.refresh()
+
+    def toggle_profile(self):
+        if not perf.profiling():
+            perf.start_profile()
+            self.showing_profile = False
+            self.refresh()
+            return
+        from tkinter import filedialog
+
+        file_path = filedialog.asksaveasfilename(
+            parent=self, defaultextension=".prof",
+            filetypes=[("Profile Data", "*.prof"), ("All Files", "*.*")])
+        # Keep the profile summary on screen until Reset.
+        self.showing_profile = True
+        self._show(perf.stop_profile(file_path or None))
+        self.profile_button.config(text="Start Profile")
+
+    def reset(self):
+        perf.reset()
+        self.showing_profile = False
+        self.refresh()
+
+    def save_report(self):
+        from tkinter import filedialog
+
+        file_path = filedialog.asksaveasfilename(parent=self, defaultextension=".txt",
+                                                 filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")])
+        if file_path:
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(perf.report() + "\n")
+
+    def _show(self, text):
+        self.text.config(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", text)
+        self.text.config(state="disabled")
+
+    def refresh(self):
+        self.profile_button.config(text="Stop Profile" if perf.profiling() else "Start Profile")
+        if not self.showing_profile:
+            self._show(perf.report())
+
+    def _tick(self):
+        self.refresh()
+        self._tick_job = self.after(self.REFRESH_MS, self._tick)
+
+    def destroy(self):
+        # A pending refresh would otherwise fire after the panel's callbacks are gone.
+        if self._tick_job is not None:
+            self.after_cancel(self._tick_job)
+            self._tick_job = None
+        super().destroy()
+
+
 class GroupingApp(tk.Tk):
+    """
+    The main window.
+
+    __init__ only builds a skeleton (settings and buttons) so the window shows
+    at once; the persons list is built right after the first paint and the
+    groups canvas the first time groups are shown. startup_times records when
+    each startup step finished, in seconds since this module started importing.
+    """
+    INDEX_SLICE = 10000  # Persons indexed per step (about 20 ms) when syncing the roster index.
+
     def __init__(self):
+        self.startup_times = {"imports": time.perf_counter() - _IMPORT_START}
         super().__init__()
         self.title("Group Generator")
         self.geometry("1200x900")  # Larger default window size.
@@ -119,13 +570,69 @@ class GroupingApp(tk.Tk):
         style.configure("TCombobox", font=("Helvetica", 10))
         style.configure("TLabelframe.Label", font=("Helvetica", 12, "bold"))
 
-        self.person_rows = []
+        self.roster = Roster()
+        self.import_task = None  # Running CSV import, if any.
+        self.imported_count = 0
         # Variables for mandatory role rules:
         self.require_writer = tk.IntVar(value=1)
         self.require_dp = tk.IntVar(value=1)
-        self.generated_groups = None  # Will store the latest groups.
+        self.role_constraints = []  # Extra per-role RoleConstraints set in the Role Rules dialog.
+        self.generated_groups = None  # Will store the latest GroupingResult.
+        self.generate_task = None  # Running group generation, if any.
+        self.export_task = None  # Running export or Save CSV, if any.
+        self.result_cache = None  # Earlier results by roster, settings and seed; made on first use.
+        self.pin_existing = tk.IntVar(value=1)  # Keep current members in place on Update Groups.
+        self.perf_panel = None
+        self._persons_view = None
+        self._groups_view = None
+        self.on_ready = None  # Called once the deferred panels are built.
+        self.roster_index = None  # Search, duplicates and role counts; built with the persons list.
+        self.find_matches = []  # Rows matching the Find box, and the one shown.
+        self.find_position = 0
+        self._find_job = None
+        self._status_job = None
+        self._index_job = None  # Next slice of a roster index sync, while one is under way.
+        self._index_changed = False  # Whether the slices so far changed the index.
 
         self.setup_gui()
+        self._startup_step("window")
+        self.after_idle(self._finish_startup)
+
+    # ---------------- STARTUP ----------------
+    def _startup_step(self, name):
+        elapsed = time.perf_counter() - _IMPORT_START
+        self.startup_times[name] = elapsed
+        perf.record(f"startup.{name}", elapsed)
+
+    def _finish_startup(self):
+        self.update_idletasks()  # Let the skeleton paint first.
+        self._startup_step("first_paint")
+        if self._persons_view is None:
+            self._build_persons_list()
+        self.update_idletasks()
+        self._startup_step("ready")
+        if self.on_ready is not None:
+            self.on_ready()
+
+    def startup_report(self):
+        """Return the startup timings (milliseconds since import began) as one line of text."""
+        return "Startup: " + ", ".join(
+            f"{name.replace('_', ' ')} {seconds * 1000:.0f} ms" for name, seconds in self.startup_times.items()
+        )
+
+    @property
+    def persons_view(self):
+        if self._persons_view is None:
+            self._build_persons_list()
+        return self._persons_view
+
+    @property
+    def groups_view(self):
+        if self._groups_view is None:
+            # One canvas that draws only the groups in view
+            self._groups_view = GroupsView(self.small_groups_frame)
+            self._groups_view.pack(fill="both", expand=True)
+        return self._groups_view
 
     def setup_gui(self):
         # ---------- Main layout with two columns ----------
@@ -170,8 +677,35 @@ class GroupingApp(tk.Tk):
         tk.Radiobutton(settings_frame, text="Disabled", variable=self.require_dp, value=0, font=("Helvetica", 10)) \
             .grid(row=2, column=2, padx=5, pady=5)
 
-        ttk.Button(settings_frame, text="Generate Groups", command=self.generate_groups) \
-            .grid(row=0, column=4, rowspan=3, padx=10, pady=5)
+        tk.Label(settings_frame, text="Role rules:", font=("Helvetica", 10)) \
+            .grid(row=3, column=0, padx=5, pady=5, sticky="e")
+        self.role_rules_label = ttk.Label(settings_frame, text="None", wraplength=260)
+        self.role_rules_label.grid(row=3, column=1, columnspan=2, padx=5, pady=5, sticky="w")
+        ttk.Button(settings_frame, text="Edit Rules...", command=self.edit_role_rules) \
+            .grid(row=3, column=3, padx=5, pady=5)
+
+        tk.Label(settings_frame, text="Candidates to compare:", font=("Helvetica", 10)) \
+            .grid(row=4, column=0, padx=5, pady=5, sticky="e")
+        self.candidates_spinbox = tk.Spinbox(settings_frame, from_=1, to=500, width=5, font=("Helvetica", 10))
+        self.candidates_spinbox.grid(row=4, column=1, padx=5, pady=5)
+
+        tk.Label(settings_frame, text="Seed (blank = random):", font=("Helvetica", 10)) \
+            .grid(row=4, column=2, padx=5, pady=5, sticky="e")
+        self.seed_entry = tk.Entry(settings_frame, width=12, font=("Helvetica", 10))
+        self.seed_entry.grid(row=4, column=3, padx=5, pady=5)
+
+        # Keep the "up to N groups" figure under the persons list current
+        def settings_changed(*args):
+            self._schedule(self._sync_roster_index, "_status_job")
+
+        for spinbox in (self.groups_spinbox, self.group_size_spinbox):
+            spinbox.configure(command=settings_changed)
+            spinbox.bind("<KeyRelease>", settings_changed)
+        self.require_writer.trace_add("write", settings_changed)
+        self.require_dp.trace_add("write", settings_changed)
+
+        self.generate_button = ttk.Button(settings_frame, text="Generate Groups", command=self.generate_groups)
+        self.generate_button.grid(row=0, column=4, rowspan=5, padx=10, pady=5)
 
         # Persons Section (fills leftover space)
         persons_frame = ttk.Labelframe(left_frame, text="Persons", padding=(10, 10))
@@ -187,21 +721,10 @@ class GroupingApp(tk.Tk):
         ttk.Button(button_frame, text="Clear All", command=self.clear_all_people).pack(side="left", padx=5)
         ttk.Button(button_frame, text="Save CSV", command=self.save_csv).pack(side="left", padx=5)
         ttk.Button(button_frame, text="Load CSV", command=self.load_csv).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Save Session", command=self.save_session).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Open Session", command=self.open_session).pack(side="left", padx=5)
 
-        # Scrollable persons list
-        persons_scroll_frame = tk.Frame(persons_frame)
-        persons_scroll_frame.pack(fill="both", expand=True)
-        self.canvas = tk.Canvas(persons_scroll_frame, borderwidth=0, highlightthickness=0)
-        self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar = ttk.Scrollbar(persons_scroll_frame, orient="vertical", command=self.canvas.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        self.canvas.bind("<Enter>", lambda e: self.canvas.bind_all("<MouseWheel>", self._on_mousewheel))
-        self.canvas.bind("<Leave>", lambda e: self.canvas.unbind_all("<MouseWheel>"))
-
-        self.rows_container = tk.Frame(self.canvas)
-        self.rows_container.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.create_window((0, 0), window=self.rows_container, anchor="nw")
+        self.persons_frame = persons_frame
 
         # ---------- Right column: "Generated Groups" section ----------
         right_frame = ttk.Frame(main_frame)
@@ -218,27 +741,10 @@ class GroupingApp(tk.Tk):
         groups_label.grid(row=0, column=0, sticky="nw", padx=5, pady=5)
 
         # (IMPORTANT) Make this frame a class attribute: self.small_groups_frame
+        # The groups canvas inside it is created on first use (see groups_view).
         self.small_groups_frame = tk.Frame(right_frame, bg="lightgray")
         self.small_groups_frame.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
 
-        # Inside that frame, the scrollable canvas
-        self.groups_canvas = tk.Canvas(self.small_groups_frame, borderwidth=0, highlightthickness=0)
-        self.groups_canvas.pack(side="left", fill="both", expand=True)
-
-        groups_scrollbar = ttk.Scrollbar(self.small_groups_frame, orient="vertical", command=self.groups_canvas.yview)
-        groups_scrollbar.pack(side="right", fill="y")
-
-        self.groups_canvas.configure(yscrollcommand=groups_scrollbar.set)
-        self.groups_canvas.bind("<Enter>", lambda e: self.groups_canvas.bind_all("<MouseWheel>", self._on_groups_mousewheel))
-        self.groups_canvas.bind("<Leave>", lambda e: self.groups_canvas.unbind_all("<MouseWheel>"))
-
-        self.groups_display_container = ttk.Frame(self.groups_canvas)
-        self.groups_display_container.bind(
-            "<Configure>",
-            lambda e: self.groups_canvas.configure(scrollregion=self.groups_canvas.bbox("all"))
-        )
-        self.groups_canvas.create_window((0, 0), window=self.groups_display_container, anchor="nw")
-
         # Buttons for Export and Clear Groups at row=2
         bottom_buttons_frame = ttk.Frame(right_frame)
         bottom_buttons_frame.grid(row=2, column=0, pady=5, sticky="ew")
@@ -246,256 +752,622 @@ class GroupingApp(tk.Tk):
         self.export_button.pack(side="left", padx=5)
         self.clear_groups_button = ttk.Button(bottom_buttons_frame, text="Clear Groups", command=self.clear_generated_groups)
         self.clear_groups_button.pack(side="left", padx=5)
+        self.update_groups_button = ttk.Button(bottom_buttons_frame, text="Update Groups",
+                                               command=self.update_groups)
+        self.update_groups_button.pack(side="left", padx=5)
+        ttk.Checkbutton(bottom_buttons_frame, text="Pin existing members", variable=self.pin_existing) \
+            .pack(side="left", padx=5)
+        self.export_label = ttk.Label(bottom_buttons_frame, text="")  # Progress of a running export.
+        self.export_label.pack(side="left", padx=5)
+
+        # Progress and Cancel, shown only while groups are being generated
+        self.generate_status_frame = ttk.Frame(bottom_buttons_frame)
+        self.generate_progress = ttk.Progressbar(self.generate_status_frame, mode="indeterminate", length=150)
+        self.generate_progress.pack(side="left", padx=5)
+        ttk.Button(self.generate_status_frame, text="Cancel", command=self.cancel_generation).pack(side="left", padx=5)
+
+        # Notices from the last generation (e.g. a reduced number of groups)
+        right_frame.rowconfigure(3, weight=0)
+        self.groups_status_label = ttk.Label(right_frame, text="", wraplength=520, justify="left")
+        self.groups_status_label.grid(row=3, column=0, sticky="ew", padx=5)
 
         # Footer
         footer = ttk.Label(self, text="© 2025 Max MacKoul Software", anchor="center", font=("Helvetica", 8))
         footer.pack(side="bottom", fill="x", padx=10, pady=5)
 
+        # Ctrl+Shift+P opens the performance panel
+        self.bind_all("<Control-P>", lambda e: self.show_perf_panel())
+
         # Example: set an sv_ttk theme if you want
         # sv_ttk.set_theme("dark")
 
-    # ---------------- MOUSE WHEEL HELPERS ----------------
-    def _on_mousewheel(self, event):
-        """Scroll the persons canvas."""
-        self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-
-    def _on_groups_mousewheel(self, event):
-        """Scroll the generated groups canvas."""
-        self.groups_canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+    def _build_persons_list(self):
+        persons_frame = self.persons_frame
+
+        # Import progress (shown only while a CSV import is running)
+        self.import_status_frame = tk.Frame(persons_frame)
+        self.import_label = ttk.Label(self.import_status_frame, text="")
+        self.import_label.pack(side="left", padx=5)
+        self.import_progress = ttk.Progressbar(self.import_status_frame, mode="determinate", maximum=100)
+        self.import_progress.pack(side="left", fill="x", expand=True, padx=5)
+        ttk.Button(self.import_status_frame, text="Cancel", command=self.cancel_import).pack(side="left", padx=5)
+
+        # Find a person by name; Enter moves to the next match
+        find_frame = tk.Frame(persons_frame)
+        find_frame.pack(fill="x", pady=(0, 5))
+        ttk.Label(find_frame, text="Find:").pack(side="left", padx=5)
+        self.find_var = tk.StringVar()
+        find_entry = ttk.Entry(find_frame, textvariable=self.find_var, width=30)
+        find_entry.pack(side="left", padx=5)
+        find_entry.bind("<Return>", lambda e: self.find_next())
+        self.find_label = ttk.Label(find_frame, text="")
+        self.find_label.pack(side="left", padx=5)
+        self.find_var.trace_add("write", lambda *args: self._schedule(self.find_person, "_find_job"))
+
+        # Counts, feasibility and duplicate warnings, kept up to date by _update_roster_status
+        self.roster_status_label = ttk.Label(persons_frame, text="", wraplength=520, justify="left")
+        self.roster_status_label.pack(side="bottom", fill="x", padx=5, pady=(5, 0))
+
+        # Scrollable persons list (only visible rows have widgets)
+        self._persons_view = PersonListView(persons_frame, self.roster, remove_callback=self.remove_person_row,
+                                            change_callback=self.roster_changed)
+        self._persons_view.pack(fill="both", expand=True)
+
+        from roster_index import RosterIndex
+
+        self.roster_index = RosterIndex(self.roster)
+        self._update_roster_status()
+
+    def show_perf_panel(self):
+        if self.perf_panel is not None and self.perf_panel.winfo_exists():
+            self.perf_panel.lift()
+        else:
+            self.perf_panel = PerfPanel(self)
 
     # ---------------- PERSONS ACTIONS ----------------
     def add_person_row(self):
-        row = PersonRow(self.rows_container, remove_callback=self.remove_person_row)
-        row.pack(fill="x", pady=2)
-        self.person_rows.append(row)
+        self.roster.add()
+        self.persons_view.scroll_to_end()
+        self.roster_changed()
 
     def remove_person_row(self, row):
-        row.destroy()
-        self.person_rows.remove(row)
+        if row.index is not None:
+            self.roster.remove(row.index)
+            self.persons_view.refresh()
+            self.roster_changed()
 
     def clear_all_people(self):
         if messagebox.askyesno("Clear All", "Are you sure you want to remove all persons?"):
-            for row in self.person_rows[:]:
-                row.destroy()
-            self.person_rows.clear()
+            self.roster.clear()
+            self.persons_view.refresh()
+            self.roster_changed()
+
+    # ---------------- FIND AND ROSTER STATUS ----------------
+    def _schedule(self, callback, job_attribute, delay_ms=150):
+        """Run callback once things settle for delay_ms, replacing any pending run."""
+        job = getattr(self, job_attribute)
+        if job is not None:
+            self.after_cancel(job)
+
+        def run():
+            setattr(self, job_attribute, None)
+            callback()
+
+        setattr(self, job_attribute, self.after(delay_ms, run))
+
+    def roster_changed(self):
+        """Call after changing the roster: updates the index, the status line and the Find matches."""
+        self._schedule(self._sync_roster_index, "_status_job")
+
+    def _sync_roster_index(self):
+        """Bring the index up to date in short slices; the status line and Find follow once it is ready."""
+        if self.roster_index is not None and self._index_job is None:
+            self._sync_index_slice()
+
+    def _sync_index_slice(self):
+        self._index_job = None
+        with perf.span("roster_index.sync"):
+            self._index_changed |= self.roster_index.sync(limit=self.INDEX_SLICE)
+        if not self.roster_index.ready:
+            # Yield to Tk between slices so opening or importing a large roster doesn't freeze the window.
+            self.roster_status_label.config(text=f"Checking {len(self.roster):,} persons...")
+            self._index_job = self.after(1, self._sync_index_slice)
+            return
+        self._finish_index_sync()
+
+    def _finish_index_sync(self):
+        changed, self._index_changed = self._index_changed, False
+        self._update_roster_status()
+        if changed and self.find_var.get().strip():
+            self.find_person(keep_position=True)
+
+    def _update_roster_status(self):
+        index = self.roster_index
+        if index is None:
+            return
+        if not index.ready:
+            self._sync_roster_index()  # Shows the status once the index has caught up.
+            return
+        lines = [f"{len(index):,} persons"]
+        try:
+            num_groups = int(self.groups_spinbox.get())
+            min_group_size = int(self.group_size_spinbox.get())
+        except ValueError:
+            min_group_size = None
+        if min_group_size is not None and min_group_size >= 2 and len(index):
+            feasible = index.feasible_groups(min_group_size, self.require_writer.get(), self.require_dp.get(),
+                                             self.role_constraints)
+            if not feasible:
+                lines[0] += " - these role rules cannot all be met"
+            else:
+                reason = feasible.high_reason
+                if reason is None:
+                    lines[0] += f" - up to {feasible.high:,} groups of {min_group_size} or more"
+                else:
+                    lines[0] += (f" - up to {feasible.high:,} groups, limited by "
+                                 f"{index.count(reason.role)} {reason.role}s ({reason.describe()})")
+                if num_groups > feasible.high:
+                    lines[0] += f", fewer than the {num_groups} requested"
+        if index.duplicate_names:
+            examples = ", ".join(f"{name} \u00d7{len(rows)}" for name, rows in index.duplicates(limit=3))
+            lines.append(f"{index.duplicate_names:,} name{'s appear' if index.duplicate_names != 1 else ' appears'} "
+                         f"more than once ({examples}{', ...' if index.duplicate_names > 3 else ''}).")
+        self.roster_status_label.config(text="\n".join(lines))
+
+    def find_person(self, keep_position=False):
+        """Show the first person whose name contains the Find text."""
+        if self.roster_index is None:
+            return
+        if not self.roster_index.ready:
+            # Searched again when the index is ready.
+            self._index_changed = True
+            self.find_label.config(text="Indexing...")
+            self._sync_roster_index()
+            return
+        with perf.span("roster_index.search"):
+            self.find_matches = self.roster_index.search(self.find_var.get())
+        if not keep_position:
+            self.find_position = 0
+        self.find_position = min(self.find_position, max(0, len(self.find_matches) - 1))
+        self._show_find_match()
+
+    def find_next(self):
+        if self.find_matches:
+            self.find_position = (self.find_position + 1) % len(self.find_matches)
+            self._show_find_match()
+
+    def _show_find_match(self):
+        if not self.find_matches:
+            self.find_label.config(text="No match" if self.find_var.get().strip() else "")
+            self.persons_view.show_row(None)
+            return
+        self.find_label.config(text=f"{self.find_position + 1} of {len(self.find_matches):,}")
+        self.persons_view.show_row(self.find_matches[self.find_position])
 
     # ---------------- CSV IMPORT/EXPORT ----------------
     def import_csv(self):
+        from tkinter import filedialog
+
         file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")])
         if file_path:
-            try:
-                with open(file_path, newline='', encoding='utf-8') as csvfile:
-                    reader = csv.reader(csvfile)
-                    for row in reader:
-                        if not row:
-                            continue
-                        name = row[0].strip() if len(row) > 0 else ""
-                        role = row[1].strip() if len(row) > 1 else ""
-                        if role == "" or role not in ALL_ROLES:
-                            role = "CREW"
-                        new_row = PersonRow(self.rows_container, remove_callback=self.remove_person_row)
-                        new_row.name_var.set(name)
-                        new_row.role_var.set(role)
-                        new_row.pack(fill="x", pady=2)
-                        self.person_rows.append(new_row)
-            except Exception as e:
-                messagebox.showerror("Import Error", f"An error occurred while importing the CSV:\n{e}")
+            self._start_csv_import(file_path, "Import")
 
     def save_csv(self):
+        from tkinter import filedialog
+        from export import export_roster
+
         file_path = filedialog.asksaveasfilename(defaultextension=".csv",
                                                  filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")])
         if file_path:
-            try:
-                with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.writer(csvfile)
-                    for row in self.person_rows:
-                        data = row.get_data()
-                        writer.writerow([data["name"], data["role"]])
-                messagebox.showinfo("Save Successful", "The persons list has been saved successfully.")
-            except Exception as e:
-                messagebox.showerror("Save Error", f"An error occurred while saving the CSV:\n{e}")
+            # Always plain CSV of every row, blank names included, so Load CSV
+            # reads it back as it was. The worker writes a copy of the columns,
+            # so the list can be edited meanwhile.
+            roster = Roster.from_columns(self.roster.names[:], self.roster.role_ids[:],
+                                         self.roster.role_names[:], self.roster.ids[:])
+            self._start_export(file_path,
+                               lambda path, **kwargs: export_roster(path, roster, "csv", False, **kwargs),
+                               "Save", "The persons list has been saved successfully.")
 
     def load_csv(self):
+        from tkinter import filedialog
+
         file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")])
         if file_path:
+            if self.import_task is not None:
+                messagebox.showerror("Load Error", "Please wait for the current import to finish.")
+                return
             self.clear_all_people()
-            try:
-                with open(file_path, newline='', encoding='utf-8') as csvfile:
-                    reader = csv.reader(csvfile)
-                    for row in reader:
-                        if not row:
-                            continue
-                        name = row[0].strip() if len(row) > 0 else ""
-                        role = row[1].strip() if len(row) > 1 else ""
-                        if role == "" or role not in ALL_ROLES:
-                            role = "CREW"
-                        new_row = PersonRow(self.rows_container, remove_callback=self.remove_person_row)
-                        new_row.name_var.set(name)
-                        new_row.role_var.set(role)
-                        new_row.pack(fill="x", pady=2)
-                        self.person_rows.append(new_row)
+            self._start_csv_import(file_path, "Load")
+
+    def _start_csv_import(self, file_path, action):
+        """Parse file_path on a worker thread and append its persons in batches."""
+        if self.import_task is not None:
+            messagebox.showerror(f"{action} Error", "Please wait for the current import to finish.")
+            return
+        from roster_csv import iter_csv_chunks
+
+        persons_view = self.persons_view  # Also builds the import progress bar.
+
+        def work(task):
+            with perf.span("csv.import") as span:
+                for persons, bytes_read, total_bytes in iter_csv_chunks(file_path):
+                    task.check_cancelled()
+                    span.add(len(persons))
+                    task.post((persons, bytes_read, total_bytes))
+
+        def on_message(message):
+            persons, bytes_read, total_bytes = message
+            self.roster.extend(persons)
+            self.imported_count += len(persons)
+            self.import_progress["value"] = 100 * bytes_read / total_bytes if total_bytes else 100
+            self.import_label.config(text=f"{action}ing... {self.imported_count} persons")
+            self.roster_changed()
+
+        def on_done(error):
+            self.import_task = None
+            self.import_status_frame.pack_forget()
+            self.persons_view.refresh()
+            self.roster_changed()
+            if isinstance(error, TaskCancelled):
+                messagebox.showinfo(f"{action} Cancelled",
+                                    f"{action} cancelled after {self.imported_count} persons.")
+            elif error is not None:
+                messagebox.showerror(f"{action} Error",
+                                     f"An error occurred while {action.lower()}ing the CSV:\n{error}")
+            elif action == "Load":
                 messagebox.showinfo("Load Successful", "The persons list has been loaded successfully.")
+
+        self.imported_count = 0
+        self.import_progress["value"] = 0
+        self.import_label.config(text=f"{action}ing...")
+        self.import_status_frame.pack(fill="x", pady=(0, 5), before=persons_view)
+        self.import_task = BackgroundTask(self, work, on_message=on_message, on_done=on_done).start()
+        self._refresh_persons_while_importing()
+
+    def _refresh_persons_while_importing(self):
+        # Redraw the visible rows a few times a second instead of once per batch.
+        if self.import_task is not None:
+            self.persons_view.refresh()
+            self.after(250, self._refresh_persons_while_importing)
+
+    def cancel_import(self):
+        if self.import_task is not None:
+            self.import_task.cancel()
+
+    # ---------------- SESSIONS ----------------
+    def save_session(self):
+        from tkinter import filedialog
+        import session
+
+        try:
+            settings = {
+                "num_groups": int(self.groups_spinbox.get()),
+                "min_group_size": int(self.group_size_spinbox.get()),
+                "candidates": int(self.candidates_spinbox.get()),
+            }
+            seed_text = self.seed_entry.get().strip()
+            settings["seed"] = int(seed_text) if seed_text else None
+        except ValueError:
+            messagebox.showerror("Parameter Error", "Invalid group parameters.")
+            return
+        settings["require_writer"] = self.require_writer.get()
+        settings["require_dp"] = self.require_dp.get()
+        settings["constraints"] = list(self.role_constraints)
+
+        file_path = filedialog.asksaveasfilename(defaultextension=".crew",
+                                                 filetypes=[("Crew Maker Sessions", "*.crew"), ("All Files", "*.*")])
+        if file_path:
+            try:
+                session.save_session(file_path, self.roster, settings, self.generated_groups)
+                messagebox.showinfo("Save Successful", "The session has been saved successfully.")
             except Exception as e:
-                messagebox.showerror("Load Error", f"An error occurred while loading the CSV:\n{e}")
+                messagebox.showerror("Save Error", f"An error occurred while saving the session:\n{e}")
+
+    def open_session(self):
+        if self.import_task is not None or self.generate_task is not None:
+            messagebox.showerror("Open Error", "Please wait for the current import or generation to finish.")
+            return
+        from tkinter import filedialog
+        import session
+
+        file_path = filedialog.askopenfilename(filetypes=[("Crew Maker Sessions", "*.crew"), ("All Files", "*.*")])
+        if not file_path:
+            return
+        try:
+            loaded = session.load_session(file_path)
+        except Exception as e:
+            messagebox.showerror("Open Error", f"An error occurred while opening the session:\n{e}")
+            return
+
+        # Names stay in the mapped file; the persons list only reads the rows on screen.
+        self.roster = loaded.roster
+        self.persons_view.roster = self.roster
+        self.persons_view.first = 0
+        self.persons_view.highlight = None
+        self.persons_view.refresh()
+        self.roster_index.roster = self.roster  # Rebuilt on the next sync.
+        self.roster_changed()
+
+        settings = loaded.settings
+        for spinbox, key in ((self.groups_spinbox, "num_groups"), (self.group_size_spinbox, "min_group_size"),
+                             (self.candidates_spinbox, "candidates")):
+            if key in settings:
+                spinbox.delete(0, "end")
+                spinbox.insert(0, str(settings[key]))
+        self.seed_entry.delete(0, "end")
+        if settings.get("seed") is not None:
+            self.seed_entry.insert(0, str(settings["seed"]))
+        self.require_writer.set(settings.get("require_writer", 1))
+        self.require_dp.set(settings.get("require_dp", 1))
+        self.set_role_constraints(settings.get("constraints", []))
+
+        if loaded.result is None:
+            self.clear_generated_groups()
+            self.groups_status_label.config(text="")
+        else:
+            self.generated_groups = loaded.result
+            self.display_groups(loaded.result)
+            self.groups_status_label.config(text="\n".join(str(notice) for notice in loaded.result.notices))
 
     # ---------------- GROUP GENERATION ----------------
+    def edit_role_rules(self):
+        RoleRulesDialog(self, self.role_constraints, on_save=self.set_role_constraints)
+
+    def set_role_constraints(self, constraints):
+        self.role_constraints = constraints
+        text = "; ".join(c.describe() for c in constraints)
+        self.role_rules_label.config(text=text or "None")
+        self._update_roster_status()
+
     def generate_groups(self):
-        random.seed()
-        self.generated_groups = None
-        persons = [row.get_data() for row in self.person_rows if row.get_data()["name"]]
-        if not persons:
-            messagebox.showerror("Input Error", "No persons added.")
+        if self.generate_task is not None:
             return
+        import random
+        import grouping_engine
+        from result_cache import ResultCache, cache_key, roster_fingerprint
 
         try:
             num_groups = int(self.groups_spinbox.get())
             min_group_size = int(self.group_size_spinbox.get())
+            candidates = int(self.candidates_spinbox.get())
+            seed_text = self.seed_entry.get().strip()
+            seed = int(seed_text) if seed_text else random.randrange(2 ** 32)
         except ValueError:
             messagebox.showerror("Parameter Error", "Invalid group parameters.")
             return
 
-        if min_group_size < 2:
-            messagebox.showerror("Parameter Error", "Minimum group size must be at least 2.")
-            return
-
-        total_people = len(persons)
-        needed = num_groups * min_group_size
-        if needed > total_people:
-            feasible_num_groups = total_people // min_group_size
-            if feasible_num_groups < 1:
-                messagebox.showerror(
-                    "Parameter Error",
-                    f"Not enough people to form even one group of size {min_group_size}."
-                )
-                return
-            num_groups = feasible_num_groups
-            messagebox.showinfo(
-                "Info",
-                f"Not enough people to form {self.groups_spinbox.get()} groups "
-                f"of size {min_group_size}. Reducing to {num_groups} groups."
-            )
-
-        require_writer = self.require_writer.get()
-        require_dp = self.require_dp.get()
-
-        writers = [p for p in persons if p["role"] == "WRITER"]
-        dps = [p for p in persons if p["role"] == "DP"]
-
-        if require_writer and len(writers) < num_groups:
-            feasible_num_groups = len(writers)
-            if feasible_num_groups < 1:
-                messagebox.showerror("Input Error", "No WRITERS available to form a group.")
+        # Duplicate names (e.g. from importing the same CSV twice) would be grouped as separate people.
+        if self.roster_index is not None:
+            # Generating reads the whole roster anyway, so finish any sync still under way in one go.
+            if self._index_job is not None:
+                self.after_cancel(self._index_job)
+                self._index_job = None
+            with perf.span("roster_index.sync"):
+                self._index_changed |= self.roster_index.sync()
+            self._finish_index_sync()
+            duplicates = self.roster_index.duplicate_names
+            if duplicates and not messagebox.askyesno(
+                    "Duplicate Names",
+                    f"{duplicates:,} name{'s appear' if duplicates != 1 else ' appears'} more than once "
+                    f"({self.roster_index.duplicate_persons:,} extra "
+                    f"{'people' if self.roster_index.duplicate_persons != 1 else 'person'}). "
+                    "Each copy will be placed in a group as a separate person.\n\nGenerate groups anyway?"):
                 return
-            if feasible_num_groups < num_groups:
-                messagebox.showinfo(
-                    "Info",
-                    f"Not enough WRITERs to fill {num_groups} groups. "
-                    f"Reducing to {feasible_num_groups} groups."
-                )
-                num_groups = feasible_num_groups
 
-        if require_dp and len(dps) < num_groups:
-            feasible_num_groups = len(dps)
-            if feasible_num_groups < 1:
-                messagebox.showerror("Input Error", "No DPs available to form a group.")
+        # Everything the worker needs is read here, on the Tk thread; the worker
+        # only sees a snapshot of the roster.
+        roster = self.roster.named()
+        rng = random.Random(seed)
+        options = {
+            "require_writer": self.require_writer.get(),
+            "require_dp": self.require_dp.get(),
+            "constraints": list(self.role_constraints),
+        }
+        if self.result_cache is None:
+            self.result_cache = ResultCache()
+        cache = self.result_cache
+
+        def work(task):
+            # The cache is only used from generation workers, one at a time.
+            with perf.span("generate.cache_lookup"):
+                key = cache_key(roster_fingerprint(roster), num_groups, min_group_size, seed=seed,
+                                candidates=candidates, **options)
+                result = cache.get(key)
+            if result is not None:
+                perf.count("generate.cache_hits")
+                # Equal fingerprints mean the same names and roles row for row,
+                # so the groups are moved onto this snapshot, whose person IDs
+                # and source_mark let Update Groups follow the roster's journal.
+                result = grouping_engine.GroupingResult(roster, result.groups, result.num_groups, result.notices)
+                task.post((result, True))
                 return
-            if feasible_num_groups < num_groups:
-                messagebox.showinfo(
-                    "Info",
-                    f"Not enough DPs to fill {num_groups} groups. "
-                    f"Reducing to {feasible_num_groups} groups."
+            with perf.span("generate") as span:
+                span.add(len(roster))
+                if candidates > 1:
+                    import batch
+
+                    # Generate several seeded groupings in parallel and keep the best one.
+                    seeds = [rng.randrange(2 ** 32) for _ in range(candidates)]
+                    scenarios = batch.generate_batch(
+                        roster, [(num_groups, min_group_size)], seeds, top_k=1,
+                        check_cancelled=task.check_cancelled, **options
+                    )
+                    if scenarios:
+                        result = scenarios[0].result
+                if result is None:
+                    result = grouping_engine.generate_groups(
+                        roster, num_groups, min_group_size, rng=rng,
+                        check_cancelled=task.check_cancelled, **options
+                    )
+            cache.put(key, result)
+            task.post((result, False))
+
+        def on_message(message):
+            result, cached = message
+            self.generated_groups = result
+            self.display_groups(result)
+            lines = [str(notice) for notice in result.notices]
+            lines.append(f"Seed: {seed}" + (" (from cache)" if cached else ""))
+            self.groups_status_label.config(text="\n".join(lines))
+
+        def on_done(error):
+            self.generate_task = None
+            self.generate_progress.stop()
+            self.generate_status_frame.pack_forget()
+            self.generate_button.state(["!disabled"])
+            if isinstance(error, TaskCancelled):
+                self.groups_status_label.config(text="Generation cancelled.")
+            elif isinstance(error, grouping_engine.GroupingError):
+                messagebox.showerror(error.title, error.message)
+            elif error is not None:
+                messagebox.showerror("Generation Error", f"An error occurred while generating groups:\n{error}")
+
+        self.groups_status_label.config(text="")
+        self.generate_button.state(["disabled"])
+        self.generate_status_frame.pack(side="right", padx=5)
+        self.generate_progress.start(15)
+        self.generate_task = BackgroundTask(self, work, on_message=on_message, on_done=on_done).start()
+
+    def update_groups(self):
+        """Fit roster changes into the current groups instead of generating new ones."""
+        if self.generate_task is not None:
+            return
+        if not self.generated_groups:
+            messagebox.showerror("Update Error", "No groups to update. Please generate groups first.")
+            return
+        try:
+            min_group_size = int(self.group_size_spinbox.get())
+        except ValueError:
+            messagebox.showerror("Parameter Error", "Invalid group parameters.")
+            return
+        import grouping_engine
+        import incremental
+
+        # Only the changed persons are looked at, so this runs on the Tk thread.
+        try:
+            with perf.span("groups.update"):
+                result = incremental.update_groups(
+                    self.generated_groups, self.roster, min_group_size,
+                    require_writer=self.require_writer.get(),
+                    require_dp=self.require_dp.get(),
+                    constraints=list(self.role_constraints),
+                    pin_existing=bool(self.pin_existing.get()),
                 )
-                num_groups = feasible_num_groups
-
-        groups = [[] for _ in range(num_groups)]
-        remaining = persons.copy()
-
-        if require_writer:
-            random.shuffle(writers)
-            for i in range(num_groups):
-                assigned = writers.pop()
-                groups[i].append(assigned)
-                remaining.remove(assigned)
-
-        if require_dp:
-            random.shuffle(dps)
-            for i in range(num_groups):
-                assigned = dps.pop()
-                groups[i].append(assigned)
-                remaining.remove(assigned)
-
-        for i in range(num_groups):
-            while len(groups[i]) < min_group_size and remaining:
-                candidate_found = False
-                for j in range(len(remaining)):
-                    candidate = remaining[j]
-                    if require_dp and candidate["role"] == "DP":
-                        dp_count = sum(1 for mem in groups[i] if mem["role"] == "DP")
-                        if dp_count >= 2:
-                            continue
-                    groups[i].append(remaining.pop(j))
-                    candidate_found = True
-                    break
-                if not candidate_found and remaining:
-                    groups[i].append(remaining.pop(0))
-
-        i = 0
-        while remaining:
-            groups[i % num_groups].append(remaining.pop(0))
-            i += 1
-
-        self.generated_groups = groups
-        self.display_groups(groups)
-
-    def display_groups(self, groups):
+        except grouping_engine.GroupingError as e:
+            messagebox.showerror(e.title, e.message)
+            return
+        except ValueError as e:
+            messagebox.showerror("Update Error", f"The current groups cannot be updated ({e}). "
+                                                 "Please generate groups again.")
+            return
+        self.generated_groups = result
+        self.display_groups(result)
+        self.groups_status_label.config(text="\n".join(str(notice) for notice in result.notices))
+
+    def cancel_generation(self):
+        if self.generate_task is not None:
+            self.generate_task.cancel()
+
+    def display_groups(self, result):
         # If no groups, do nothing or hide the frame
-        if not groups:
+        if result is None or not result.groups:
             self.clear_generated_groups()
             return
 
         # Show the frame in case it was hidden
         self.small_groups_frame.grid()
-
-        # Clear old content
-        for widget in self.groups_display_container.winfo_children():
-            widget.destroy()
-
-        # Build new frames
-        for i, group in enumerate(groups, start=1):
-            group_frame = ttk.Labelframe(self.groups_display_container, text=f"Group {i}", padding=(10, 10))
-            group_frame.pack(fill="x", padx=5, pady=5)
-            for person in group:
-                ttk.Label(group_frame, text=f"{person['name']} - {person['role']}").pack(anchor="w")
+        with perf.span("groups.display"):
+            self.groups_view.set_result(result)
 
     def export_groups(self):
         if not self.generated_groups:
             messagebox.showerror("Export Error", "No groups to export. Please generate groups first.")
             return
+        from tkinter import filedialog
+        from export import export_groups
+
+        # The format follows the extension; add .gz to compress.
         file_path = filedialog.asksaveasfilename(
             defaultextension=".txt",
-            filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")])
+            filetypes=[("Text Files", "*.txt"), ("CSV Files", "*.csv"), ("JSON Lines", "*.jsonl"),
+                       ("Gzipped Files", "*.gz"), ("All Files", "*.*")])
         if file_path:
-            try:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    for i, group in enumerate(self.generated_groups, start=1):
-                        f.write(f"Group {i}:\n")
-                        for person in group:
-                            f.write(f"{person['name']} - {person['role']}\n")
-                        f.write("\n")
-                messagebox.showinfo("Export Successful", "The groups have been exported successfully.")
-            except Exception as e:
-                messagebox.showerror("Export Error", f"An error occurred while exporting the groups:\n{e}")
+            # Results are never changed once made, so the worker can read this one directly.
+            result = self.generated_groups
+            self._start_export(file_path, lambda path, **kwargs: export_groups(path, result, **kwargs),
+                               "Export", "The groups have been exported successfully.")
+
+    def _start_export(self, file_path, export, action, success_message):
+        """Run export(file_path, check_cancelled=..., progress=...) on a worker thread."""
+        if self.export_task is not None:
+            messagebox.showerror(f"{action} Error", "Please wait for the current export to finish.")
+            return
+
+        def work(task):
+            with perf.span("export"):
+                export(file_path, check_cancelled=task.check_cancelled, progress=task.post)
+
+        def on_message(rows):
+            self.export_label.config(text=f"Writing... {rows:,} rows")
+
+        def on_done(error):
+            self.export_task = None
+            self.export_label.config(text="")
+            if error is None:
+                messagebox.showinfo(f"{action} Successful", success_message)
+            elif not isinstance(error, TaskCancelled):
+                messagebox.showerror(f"{action} Error", f"An error occurred while writing {file_path}:\n{error}")
+
+        self.export_label.config(text="Writing...")
+        self.export_task = BackgroundTask(self, work, on_message=on_message, on_done=on_done).start()
 
     def clear_generated_groups(self):
-        # Remove the group frames from the container
-        for widget in self.groups_display_container.winfo_children():
-            widget.destroy()
+        # Remove the drawn groups (if the canvas has been built yet)
+        if self._groups_view is not None:
+            self._groups_view.clear()
         self.generated_groups = None
 
         # Hide the frame so you don't see the gray area
         self.small_groups_frame.grid_remove()
 
 
-if __name__ == "__main__":
+def main(argv=None):
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Crew Maker")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long startup took once the window is ready, then exit")
+    parser.add_argument("--startup-budget", type=float, metavar="MS",
+                        default=float(os.environ.get("CREWMAKER_STARTUP_BUDGET_MS", STARTUP_BUDGET_MS)),
+                        help="warn when startup takes longer than this (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if getattr(sys, "frozen", False):
+        # Needed for the batch process pool in a PyInstaller build.
+        import multiprocessing
+
+        multiprocessing.freeze_support()
+    perf.enable_from_environment()
     app = GroupingApp()
+    status = 0
+
+    def on_ready():
+        nonlocal status
+        ready_ms = app.startup_times["ready"] * 1000
+        over = ready_ms > args.startup_budget
+        if args.startup_report or over:
+            print(f"{app.startup_report()} (budget {args.startup_budget:.0f} ms)"
+                  + (" -- over budget" if over else ""), file=sys.stderr)
+        if args.startup_report:
+            status = 1 if over else 0
+            app.destroy()
+
+    app.on_ready = on_ready
     app.mainloop()
+    perf.finish(sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
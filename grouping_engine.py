@@ -0,0 +1,292 @@
+"""
+Headless group generation for Crew Maker.
+
+This module does not depend on Tk, so it can be imported from scripts and
+services. For the same random state it builds exactly the same groups as the
+"Generate Groups" button, but in linear time: people are tracked through
+index-based pools and per-group role counters instead of list removals, and
+role lookups use the roster's precomputed role -> members index.
+"""
+import random
+
+from constraints import (
+    assign_groups,
+    explain_high,
+    explain_low,
+    feasible_group_range,
+    merge_constraints,
+)
+
+
+class GroupingError(Exception):
+    """
+    Raised when the persons and settings cannot form a single group.
+
+    constraint is the RoleConstraint responsible, when one is.
+    """
+    def __init__(self, title, message, constraint=None):
+        super().__init__(message)
+        self.title = title
+        self.message = message
+        self.constraint = constraint
+
+
+class Notice:
+    """
+    A change generate_groups made to the requested number of groups.
+
+    kind is "reduced", "increased" or, from incremental.update_groups,
+    "moved"; requested and num_groups are the group counts before and after;
+    role is the role whose count or rule forced the change, or None when it
+    was the number of people and the minimum size. str(notice) is the message
+    shown to users.
+    """
+    def __init__(self, kind, message, requested, num_groups, role=None):
+        self.kind = kind
+        self.message = message
+        self.requested = requested
+        self.num_groups = num_groups
+        self.role = role
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return f"Notice({self.kind!r}, {self.message!r})"
+
+
+class GroupingResult:
+    """
+    The groups built by generate_groups plus any informational notices.
+
+    Each group is a list of row indices into roster, the snapshot of named
+    persons the groups were built from.
+    """
+    def __init__(self, roster, groups, num_groups, notices):
+        self.roster = roster
+        self.groups = groups
+        self.num_groups = num_groups
+        self.notices = notices
+
+    def members(self, group):
+        """Yield (name, role) for each member of group."""
+        names = self.roster.names
+        role_names = self.roster.role_names
+        role_ids = self.roster.role_ids
+        for index in group:
+            yield names[index], role_names[role_ids[index]]
+
+    def check(self):
+        """Raise ValueError unless every row of roster is in exactly one group."""
+        seen = bytearray(len(self.roster))
+        for number, group in enumerate(self.groups, start=1):
+            for index in group:
+                if seen[index]:
+                    raise ValueError(f"row {index} is in more than one group (again in group {number})")
+                seen[index] = 1
+        missing = seen.find(0)
+        if missing != -1:
+            raise ValueError(f"row {missing} is in no group")
+
+
+def generate_groups(roster, num_groups, min_group_size, require_writer=True, require_dp=True, rng=None,
+                    constraints=None, check_cancelled=None):
+    """
+    Split the named persons of roster into groups.
+
+    Every group gets one WRITER and/or one DP when required, is filled up to
+    min_group_size, and leftover people are dealt round-robin. When there are
+    not enough people or required roles, the number of groups is reduced and a
+    notice is recorded. Raises GroupingError when no group can be formed.
+
+    When constraints (a list of RoleConstraint) is given, the WRITER/DP toggles
+    are merged into it and the constraint-driven assignment is used instead.
+
+    check_cancelled, if given, is called between steps and should raise to
+    abandon the run (see background.BackgroundTask.check_cancelled).
+    """
+    if rng is None:
+        rng = random
+    if check_cancelled is None:
+        check_cancelled = _never_cancelled
+    roster = roster.named()
+    check_cancelled()
+    if not len(roster):
+        raise GroupingError("Input Error", "No persons added.")
+    if min_group_size < 2:
+        raise GroupingError("Parameter Error", "Minimum group size must be at least 2.")
+    if num_groups < 1:
+        raise GroupingError("Parameter Error", "Number of groups must be at least 1.")
+    if constraints:
+        constraints = merge_constraints(constraints, require_writer, require_dp)
+        return _generate_constrained(roster, num_groups, min_group_size, constraints, rng, check_cancelled)
+
+    notices = []
+    total_people = len(roster)
+    if num_groups * min_group_size > total_people:
+        feasible_num_groups = total_people // min_group_size
+        if feasible_num_groups < 1:
+            raise GroupingError(
+                "Parameter Error",
+                f"Not enough people to form even one group of size {min_group_size}."
+            )
+        notices.append(Notice(
+            "reduced",
+            f"Not enough people to form {num_groups} groups "
+            f"of size {min_group_size}. Reducing to {feasible_num_groups} groups.",
+            num_groups, feasible_num_groups
+        ))
+        num_groups = feasible_num_groups
+
+    writers = list(roster.members("WRITER"))
+    dps = list(roster.members("DP"))
+
+    if require_writer and len(writers) < num_groups:
+        if not writers:
+            raise GroupingError("Input Error", "No WRITERS available to form a group.")
+        notices.append(Notice(
+            "reduced",
+            f"Not enough WRITERs to fill {num_groups} groups. "
+            f"Reducing to {len(writers)} groups.",
+            num_groups, len(writers), role="WRITER"
+        ))
+        num_groups = len(writers)
+
+    if require_dp and len(dps) < num_groups:
+        if not dps:
+            raise GroupingError("Input Error", "No DPs available to form a group.")
+        notices.append(Notice(
+            "reduced",
+            f"Not enough DPs to fill {num_groups} groups. "
+            f"Reducing to {len(dps)} groups.",
+            num_groups, len(dps), role="DP"
+        ))
+        num_groups = len(dps)
+
+    groups = [[] for _ in range(num_groups)]
+    dp_counts = [0] * num_groups
+    taken = bytearray(total_people)
+
+    # ---------- Required roles ----------
+    if require_writer:
+        _assign_one_each(roster, writers, groups, taken, rng)
+    if require_dp:
+        _assign_one_each(roster, dps, groups, taken, rng)
+        dp_counts = [1] * num_groups
+    check_cancelled()
+
+    # ---------- Fill up to the minimum size ----------
+    # Remaining people keep their input order. When the DP cap applies they are
+    # split into two ordered pools so "first eligible person" is a pointer
+    # comparison rather than a scan.
+    if require_dp:
+        dp_id = roster.role_id("DP")
+        role_ids = roster.role_ids
+        others = [i for i in range(total_people) if not taken[i] and role_ids[i] != dp_id]
+        spare_dps = [i for i in roster.members("DP") if not taken[i]]
+    else:
+        others = [i for i in range(total_people) if not taken[i]]
+        spare_dps = []
+    oi = di = 0
+
+    for g, group in enumerate(groups):
+        while len(group) < min_group_size and (oi < len(others) or di < len(spare_dps)):
+            take_dp = di < len(spare_dps) and (
+                oi >= len(others) or (spare_dps[di] < others[oi] and dp_counts[g] < 2)
+            )
+            if take_dp:
+                group.append(spare_dps[di])
+                dp_counts[g] += 1
+                di += 1
+            else:
+                group.append(others[oi])
+                oi += 1
+
+    check_cancelled()
+
+    # ---------- Deal the rest round-robin, in input order ----------
+    i = 0
+    while oi < len(others) or di < len(spare_dps):
+        if not i & 0xFFFF:
+            check_cancelled()
+        if di >= len(spare_dps) or (oi < len(others) and others[oi] < spare_dps[di]):
+            groups[i % num_groups].append(others[oi])
+            oi += 1
+        else:
+            groups[i % num_groups].append(spare_dps[di])
+            di += 1
+        i += 1
+
+    return GroupingResult(roster, groups, num_groups, notices)
+
+
+def _never_cancelled():
+    pass
+
+
+def _generate_constrained(roster, num_groups, min_group_size, constraints, rng, check_cancelled):
+    """Pick a feasible number of groups for constraints and deal the roster into them."""
+    feasible = feasible_group_range(roster, min_group_size, constraints)
+    if feasible.high < 1:
+        reason = feasible.high_reason
+        if reason is None:
+            raise GroupingError(
+                "Parameter Error",
+                f"Not enough people to form even one group of size {min_group_size}."
+            )
+        raise GroupingError(
+            "Input Error",
+            f"Not enough {reason.role}s to form a group "
+            f"({roster.count(reason.role)} available, rule: {reason.describe()}).",
+            constraint=reason
+        )
+    if not feasible:
+        message = explain_low(roster, feasible.high, feasible.low_reason)
+        if feasible.low_reason.maximum:
+            limit = explain_high(roster, min_group_size, feasible.high + 1, feasible.high_reason)
+            message += f" At least {feasible.low} groups are needed, but: {limit}"
+        raise GroupingError("Input Error", message, constraint=feasible.low_reason)
+
+    notices = []
+    if num_groups > feasible.high:
+        reason = feasible.high_reason
+        notices.append(Notice(
+            "reduced",
+            f"{explain_high(roster, min_group_size, num_groups, reason)} "
+            f"Reducing to {feasible.high} groups.",
+            num_groups, feasible.high, role=reason.role if reason else None
+        ))
+        num_groups = feasible.high
+    elif num_groups < feasible.low:
+        notices.append(Notice(
+            "increased",
+            f"{explain_low(roster, num_groups, feasible.low_reason)} "
+            f"Increasing to {feasible.low} groups.",
+            num_groups, feasible.low, role=feasible.low_reason.role
+        ))
+        num_groups = feasible.low
+
+    check_cancelled()
+    groups = assign_groups(roster, num_groups, constraints, rng)
+    check_cancelled()
+    return GroupingResult(roster, groups, num_groups, notices)
+
+
+def _assign_one_each(roster, candidates, groups, taken, rng):
+    """Give each group one shuffled candidate, consuming the earliest equal person."""
+    rng.shuffle(candidates)
+    # Equal persons are interchangeable; removing the earliest untaken one keeps
+    # the order of the remaining people identical to list.remove().
+    names = roster.names
+    positions = {}
+    for i in sorted(candidates):
+        positions.setdefault(names[i], []).append(i)
+    heads = dict.fromkeys(positions, 0)
+    for group in groups:
+        name = names[candidates.pop()]
+        # The group must get the row that is marked taken, or a shared name
+        # would put one row in two groups and leave the other out.
+        index = positions[name][heads[name]]
+        group.append(index)
+        taken[index] = 1
+        heads[name] += 1
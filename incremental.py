@@ -0,0 +1,314 @@
+"""
+Incremental updates of generated groups after the roster changes.
+
+update_groups keeps everyone from a previous GroupingResult in the group they
+were in, places people who were added (or whose role changed) and repairs the
+groups that lost someone, moving as few existing members as possible. People
+are matched between the old snapshot and the roster by person ID
+(Roster.ids), so renaming someone keeps them where they are.
+
+When the previous result was built from a snapshot of the same roster, the
+roster's edit journal says who changed, and the new snapshot is the old one
+with those rows updated or appended; removed people stay in it as rows that
+are in no group. The new snapshot shares the old one's columns and copies
+only those it changes (removing people changes none), and the work is
+otherwise proportional to the number of people changed or moved times the
+number of groups. Otherwise (for example after opening a session) the previous groups
+are mapped onto a fresh snapshot in one pass over the roster.
+"""
+import random
+import weakref
+from array import array
+
+from constraints import merge_constraints
+from grouping_engine import GroupingError, GroupingResult, Notice
+from roster import Roster
+
+# GroupingResult -> _Layout, built on first use and handed on to each update.
+_layouts = weakref.WeakKeyDictionary()
+
+
+class _Layout:
+    """Which group each snapshot row is in (-1 for none) and, per role ID, how many each group has."""
+    def __init__(self, group_of, counts):
+        self.group_of = group_of
+        self.counts = counts
+
+
+def _layout(result):
+    layout = _layouts.get(result)
+    if layout is None:
+        num_groups = len(result.groups)
+        role_ids = result.roster.role_ids
+        group_of = array("i", [-1]) * len(result.roster)
+        counts = {}
+        for g, group in enumerate(result.groups):
+            for row in group:
+                if group_of[row] >= 0:
+                    # unplace() would then drop the wrong entry and corrupt the counts.
+                    raise ValueError(f"row {row} is in more than one group (again in group {g + 1})")
+                group_of[row] = g
+                per_group = counts.get(role_ids[row])
+                if per_group is None:
+                    per_group = counts[role_ids[row]] = [0] * num_groups
+                per_group[g] += 1
+        layout = _layouts[result] = _Layout(group_of, counts)
+    return layout
+
+
+class _Groups:
+    """
+    The groups being updated.
+
+    Group lists shared with the previous result are copied on first change.
+    With shared=True the layout belongs to the previous result too, and
+    group_of and each role's counts are likewise copied on first change.
+    """
+    def __init__(self, snapshot, groups, layout, shared=False):
+        self.snapshot = snapshot
+        self.groups = list(groups)
+        self.group_of = layout.group_of
+        self.counts = dict(layout.counts) if shared else layout.counts
+        self._copied = set()
+        self._group_of_shared = shared
+        self._shared_counts = set(layout.counts) if shared else set()
+
+    def size(self, g):
+        return len(self.groups[g])
+
+    def count(self, role_id, g):
+        per_group = self.counts.get(role_id)
+        return per_group[g] if per_group is not None else 0
+
+    def _own(self, g):
+        if g not in self._copied:
+            self.groups[g] = list(self.groups[g])
+            self._copied.add(g)
+        return self.groups[g]
+
+    def own_group_of(self):
+        if self._group_of_shared:
+            self.group_of = self.group_of[:]
+            self._group_of_shared = False
+        return self.group_of
+
+    def _own_counts(self, role_id):
+        if role_id in self._shared_counts:
+            self.counts[role_id] = list(self.counts[role_id])
+            self._shared_counts.discard(role_id)
+        elif role_id not in self.counts:
+            self.counts[role_id] = [0] * len(self.groups)
+        return self.counts[role_id]
+
+    def place(self, row, g):
+        self._own(g).append(row)
+        self.own_group_of()[row] = g
+        self._own_counts(self.snapshot.role_ids[row])[g] += 1
+
+    def unplace(self, row):
+        g = self.group_of[row]
+        self._own(g).remove(row)
+        self.own_group_of()[row] = -1
+        self._own_counts(self.snapshot.role_ids[row])[g] -= 1
+
+
+def update_groups(previous, roster, min_group_size, require_writer=True, require_dp=True, constraints=None,
+                  pinned=None, pin_existing=False, rng=None):
+    """
+    Return a GroupingResult for roster that keeps previous's groups where possible.
+
+    The number of groups stays the same. Added people go to a group that
+    still needs their role, otherwise to the smallest group their role rules
+    allow. A group left short of a required role or below min_group_size takes
+    someone from a group that can spare them, newest members first. pinned is
+    a set of person IDs that must not be moved; pin_existing=True pins
+    everyone who was in previous's groups.
+
+    Raises GroupingError when the requirements cannot be met this way; the
+    groups then have to be generated again. Raises ValueError when previous
+    places a row more than once.
+    """
+    num_groups = len(previous.groups)
+    if num_groups == 0:
+        raise GroupingError("Update Error", "There are no groups to update. Please generate groups first.")
+    rng = rng or random.Random()
+    rules = merge_constraints(constraints or [], require_writer, require_dp)
+
+    changed = roster.edited_since(previous.roster.source_mark)
+    if changed is None:
+        state, added = _remap(previous, roster)
+    else:
+        state, added = _apply_edits(previous, roster, changed)
+
+    pinned = pinned or frozenset()
+    old_rows = 0
+    if pin_existing:
+        if changed is None:
+            pinned = set(pinned) | set(previous.roster.ids)
+        else:
+            old_rows = len(previous.roster)  # Rows carried over from the previous snapshot.
+    ids = state.snapshot.ids
+
+    def movable(row):
+        return row >= old_rows and ids[row] not in pinned
+
+    moved = _repair(state, added, rules, min_group_size, movable, rng)
+    notices = []
+    if moved:
+        notices.append(Notice(
+            "moved",
+            f"Moved {moved} existing member{'s' if moved != 1 else ''} to keep the role requirements "
+            "and minimum group size.",
+            num_groups, num_groups
+        ))
+    result = GroupingResult(state.snapshot, state.groups, num_groups, notices)
+    _layouts[result] = _Layout(state.group_of, state.counts)
+    return result
+
+
+def _apply_edits(previous, roster, changed):
+    """Build the new state from previous's snapshot and the IDs edited since it was taken."""
+    old = previous.roster
+    # The new snapshot and layout start out sharing previous's columns (only
+    # the small role table is copied); a column is copied the first time this
+    # update writes to it, so previous is never changed.
+    snapshot = Roster.from_columns(old.names, old.role_ids, list(roster.role_names), old.ids)
+    snapshot.source_mark = roster.edit_mark()
+    state = _Groups(snapshot, previous.groups, _layout(previous), shared=True)
+    copied = set()
+
+    def own(column):
+        if column not in copied:
+            setattr(snapshot, column, getattr(snapshot, column)[:])
+            copied.add(column)
+        return getattr(snapshot, column)
+
+    added = []
+    # Ascending order keeps appended IDs sorted.
+    for person_id in sorted(changed):
+        row = snapshot.row_of(person_id)
+        current = roster.row_of(person_id)
+        name = roster.names[current].strip() if current is not None else ""
+        if row is None:
+            if name:
+                own("names").append(name)
+                own("role_ids").append(snapshot.role_id(roster.role(current)))
+                own("ids").append(person_id)
+                state.own_group_of().append(-1)
+                added.append(len(snapshot) - 1)
+            continue
+        role_id = snapshot.role_id(roster.role(current)) if name else None
+        if state.group_of[row] >= 0 and role_id != snapshot.role_ids[row]:
+            state.unplace(row)
+        if name:
+            if snapshot.names[row] != name:
+                own("names")[row] = name
+            if snapshot.role_ids[row] != role_id:
+                own("role_ids")[row] = role_id
+            if state.group_of[row] < 0:
+                added.append(row)
+    return state, added
+
+
+def _remap(previous, roster):
+    """Build the new state by mapping previous's groups onto a fresh snapshot of roster."""
+    snapshot = roster.named()
+    old = previous.roster
+    groups = []
+    for group in previous.groups:
+        kept = []
+        for index in group:
+            row = snapshot.row_of(old.ids[index])
+            if row is not None and snapshot.role(row) == old.role(index):
+                kept.append(row)
+        groups.append(kept)
+    result = GroupingResult(snapshot, groups, len(groups), [])
+    layout = _layout(result)
+    added = [row for row, g in enumerate(layout.group_of) if g < 0]
+    return _Groups(snapshot, groups, layout), added
+
+
+def _repair(state, added, rules, min_group_size, movable, rng):
+    """Place added rows, then backfill role minimums and group sizes. Returns how many people were moved."""
+    snapshot = state.snapshot
+    num_groups = len(state.groups)
+    by_role_id = {snapshot.role_id(rule.role): rule for rule in rules}
+    # Visit groups in a random order so that ties do not always favour group 1.
+    order = list(range(num_groups))
+    rng.shuffle(order)
+    rng.shuffle(added)
+    moved = 0
+
+    # ---------- Place the people who are new to the groups ----------
+    for row in added:
+        role_id = snapshot.role_ids[row]
+        rule = by_role_id.get(role_id)
+        if rule is None:
+            state.place(row, min(order, key=state.size))
+            continue
+        allowed = [g for g in order if rule.maximum is None or state.count(role_id, g) < rule.maximum]
+        if not allowed:
+            raise GroupingError(
+                "Update Error",
+                f"Every group already has {rule.maximum} {rule.role}, so {snapshot.names[row]} cannot be added "
+                f"({rule.describe()}). Please generate groups again.",
+                rule
+            )
+        state.place(row, min(allowed, key=lambda g: (state.count(role_id, g) >= rule.minimum, state.size(g))))
+
+    # ---------- Backfill groups that lost a required role ----------
+    for role_id, rule in by_role_id.items():
+        for g in order:
+            while state.count(role_id, g) < rule.minimum:
+                donors = sorted((d for d in order if state.count(role_id, d) > rule.minimum),
+                                key=state.size, reverse=True)
+                for d in donors:
+                    row = _newest(state.groups[d], lambda row: snapshot.role_ids[row] == role_id and movable(row))
+                    if row is not None:
+                        state.unplace(row)
+                        state.place(row, g)
+                        moved += 1
+                        break
+                else:
+                    reason = "every spare one is pinned" if donors else "no other group can spare one"
+                    raise GroupingError(
+                        "Update Error",
+                        f"Group {g + 1} needs {rule.describe()}, but {reason}. "
+                        f"Add a {rule.role}, unpin members or generate groups again.",
+                        rule
+                    )
+
+    # ---------- Refill groups that fell below the minimum size ----------
+    def can_leave(row, donor, g):
+        if not movable(row):
+            return False
+        role_id = snapshot.role_ids[row]
+        rule = by_role_id.get(role_id)
+        return rule is None or (state.count(role_id, donor) > rule.minimum
+                                and (rule.maximum is None or state.count(role_id, g) < rule.maximum))
+
+    for g in order:
+        while state.size(g) < min_group_size:
+            donors = sorted((d for d in order if state.size(d) > min_group_size), key=state.size, reverse=True)
+            for d in donors:
+                row = _newest(state.groups[d], lambda row: can_leave(row, d, g))
+                if row is not None:
+                    state.unplace(row)
+                    state.place(row, g)
+                    moved += 1
+                    break
+            else:
+                raise GroupingError(
+                    "Update Error",
+                    f"Group {g + 1} has fewer than {min_group_size} people and no other group can spare anyone. "
+                    "Please generate groups again."
+                )
+    return moved
+
+
+def _newest(group, accept):
+    """Return the most recently placed member of group that accept()s, or None."""
+    for position in range(len(group) - 1, -1, -1):
+        if accept(group[position]):
+            return group[position]
+    return None
@@ -0,0 +1,257 @@
+"""
+Lightweight timing and counter instrumentation.
+
+Hot paths are wrapped in spans and counters:
+
+    with perf.span("csv.import") as span:
+        for persons in chunks:
+            span.add(len(persons))    # items, for a per-second rate
+    perf.gauge("persons.row_widgets", len(pool))
+
+While instrumentation is disabled (the default) span() returns a shared
+object whose methods do nothing and count()/gauge() return at once, so the
+calls can stay in the code. Enable it with enable() or by starting the app
+with CREWMAKER_PERF set:
+
+    CREWMAKER_PERF=1                     timings and counters
+    CREWMAKER_PERF=memory                also trace peak memory with tracemalloc
+    CREWMAKER_PERF=memory,profile        also capture a cProfile profile
+    CREWMAKER_PERF_LOG=perf.log          append each span to a log file
+    CREWMAKER_PERF_PROFILE=app.prof      where to save a profile still running at exit
+
+report() returns the current figures as text; the GUI shows it in the
+Performance panel (Ctrl+Shift+P) and finish() prints it when the app exits.
+"""
+import os
+import threading
+import time
+
+enabled = False
+_lock = threading.Lock()
+_spans = {}  # Name -> _SpanStats.
+_counters = {}
+_gauges = {}
+_profiler = None
+_logger = None  # Set up by enable(log_path=...); logging is imported only then.
+
+
+class _SpanStats:
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.items = 0
+
+
+class _Span:
+    """Times one with-block and records it under name when it ends."""
+    __slots__ = ("name", "items", "_start")
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+
+    def add(self, items):
+        self.items += items
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self._start, self.items)
+        return False
+
+
+class _NoSpan:
+    """Returned by span() while disabled."""
+    __slots__ = ()
+
+    def add(self, items):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """Return a context manager that times its block as name."""
+    if not enabled:
+        return _NO_SPAN
+    return _Span(name)
+
+
+def record(name, seconds, items=0):
+    """Add one timing (and optional item count) for name."""
+    if not enabled:
+        return
+    with _lock:
+        stats = _spans.get(name)
+        if stats is None:
+            stats = _spans[name] = _SpanStats()
+        stats.calls += 1
+        stats.total += seconds
+        stats.last = seconds
+        stats.max = max(stats.max, seconds)
+        stats.items += items
+    if _logger is not None:
+        _logger.info("%s %.6fs%s", name, seconds, f" {items} items" if items else "")
+
+
+def count(name, amount=1):
+    """Add amount to the counter name."""
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def gauge(name, value):
+    """Set the current value of name (e.g. a widget count)."""
+    if not enabled:
+        return
+    _gauges[name] = value
+
+
+# ---------------- CONTROL ----------------
+def enable(memory=False, profile=False, log_path=None):
+    """Turn instrumentation on, optionally with tracemalloc, cProfile and a log file."""
+    global enabled, _logger
+    enabled = True
+    if memory:
+        trace_memory(True)
+    if profile:
+        start_profile()
+    if log_path and _logger is None:
+        import logging
+
+        _logger = logging.getLogger("crewmaker.perf")
+        handler = logging.FileHandler(log_path, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        _logger.addHandler(handler)
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+
+
+def disable():
+    """Turn instrumentation off and stop memory tracing (figures are kept until reset())."""
+    global enabled
+    enabled = False
+    trace_memory(False)
+
+
+def trace_memory(on):
+    """Start or stop tracing allocations with tracemalloc (slows Python down noticeably)."""
+    import tracemalloc
+
+    if on and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not on and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _gauges.clear()
+    import tracemalloc
+
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+
+def memory_tracing():
+    import tracemalloc
+
+    return tracemalloc.is_tracing()
+
+
+def enable_from_environment():
+    """Enable instrumentation if CREWMAKER_PERF is set (see the module docstring)."""
+    value = os.environ.get("CREWMAKER_PERF", "").strip().lower()
+    if not value or value in ("0", "off", "false", "no"):
+        return
+    options = {option.strip() for option in value.split(",")}
+    enable(memory="memory" in options, profile="profile" in options,
+           log_path=os.environ.get("CREWMAKER_PERF_LOG"))
+
+
+# ---------------- PROFILING ----------------
+def start_profile():
+    """Start capturing a cProfile profile (of the calling thread)."""
+    global _profiler
+    if _profiler is None:
+        import cProfile
+
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def profiling():
+    return _profiler is not None
+
+
+def stop_profile(path=None, limit=30):
+    """
+    Stop the profile and return the top functions by cumulative time as text.
+
+    With path, the raw statistics are also saved there for pstats or snakeviz.
+    """
+    global _profiler
+    if _profiler is None:
+        return ""
+    import io
+    import pstats
+
+    profiler, _profiler = _profiler, None
+    profiler.disable()
+    if path:
+        profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+# ---------------- REPORTING ----------------
+def finish(out):
+    """At exit: write the report and any running profile's summary to out, if enabled."""
+    if profiling():
+        out.write(stop_profile(os.environ.get("CREWMAKER_PERF_PROFILE")) + "\n")
+    if enabled:
+        out.write(report() + "\n")
+
+
+def report():
+    """Return the recorded spans, counters, gauges and memory use as text."""
+    with _lock:
+        spans = sorted(_spans.items())
+        counters = sorted(_counters.items())
+    gauges = sorted(_gauges.items())
+    lines = [f"{'span':<24}{'calls':>7}{'total ms':>11}{'avg ms':>9}{'max ms':>9}{'last ms':>9}{'items/s':>11}"]
+    for name, stats in spans:
+        rate = f"{stats.items / stats.total:,.0f}" if stats.items and stats.total else ""
+        lines.append(f"{name:<24}{stats.calls:>7}{stats.total * 1000:>11.1f}"
+                     f"{stats.total * 1000 / stats.calls:>9.2f}{stats.max * 1000:>9.2f}"
+                     f"{stats.last * 1000:>9.2f}{rate:>11}")
+    if counters or gauges:
+        lines.append("")
+        lines.extend(f"{name:<24}{value:>12,}" for name, value in counters + gauges)
+    if memory_tracing():
+        import tracemalloc
+
+        current, peak = tracemalloc.get_traced_memory()
+        lines.append("")
+        lines.append(f"{'memory (current)':<24}{current / 2 ** 20:>10.1f} MB")
+        lines.append(f"{'memory (peak)':<24}{peak / 2 ** 20:>10.1f} MB")
+    if not enabled:
+        lines.append("")
+        lines.append("Instrumentation is off.")
+    return "\n".join(lines)
@@ -0,0 +1,150 @@
+"""
+A bounded cache of generated groupings.
+
+Groups are fully determined by the roster, the settings and the seed, so a
+result can be stored under a hash of those and handed back when the same
+configuration is asked for again. Entries live in an in-memory LRU and,
+when a directory is given, in a second on-disk LRU tier of session files
+that survives restarts.
+"""
+import hashlib
+import json
+import os
+import sys
+from array import array
+from collections import OrderedDict
+
+import session
+from constraints import merge_constraints
+from roster import Roster
+
+# Bump when a change to the grouping algorithm (or to cache_key) makes earlier results stale.
+ALGORITHM_VERSION = 2
+
+
+def roster_fingerprint(roster):
+    """
+    Return a hex digest of each person's name and role.
+
+    Role IDs depend on the order roles were first seen (and a role table keeps
+    roles nobody has any more), so they are renumbered by first use among the
+    persons before hashing: equal rosters get equal fingerprints.
+    """
+    role_ids = roster.role_ids
+    used = list(dict.fromkeys(role_ids))
+    if max(used, default=0) < 256:
+        # Every ID fits in its low byte, so renumbering is a bytes.translate.
+        table = bytearray(range(256))
+        for new_id, role_id in enumerate(used):
+            table[role_id] = new_id
+        column = role_ids.tobytes()[0 if sys.byteorder == "little" else 1::2].translate(table)
+    else:
+        renumber = dict(zip(used, range(len(used))))
+        column = array("H", map(renumber.__getitem__, role_ids)).tobytes()
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps([roster.role_names[role_id] for role_id in used]).encode("utf-8"))
+    digest.update(column)
+    digest.update("\0".join(roster.names).encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+def cache_key(fingerprint, num_groups, min_group_size, require_writer=True, require_dp=True,
+              constraints=None, seed=None, candidates=1):
+    """Return the cache key for one configuration; seed must be given for the result to be reproducible."""
+    # Rules are kept in the order generate_groups applies them: roles are
+    # dealt in that order and a later rule for a role replaces an earlier one.
+    rules = []
+    if constraints:
+        rules = [(c.role, c.minimum, c.maximum)
+                 for c in merge_constraints(constraints, require_writer, require_dp)]
+    settings = [ALGORITHM_VERSION, fingerprint, num_groups, min_group_size, bool(require_writer),
+                bool(require_dp), rules, seed, candidates]
+    return hashlib.blake2b(json.dumps(settings).encode("utf-8"), digest_size=20).hexdigest()
+
+
+class ResultCache:
+    """
+    An LRU cache of GroupingResults by cache_key.
+
+    max_entries bounds the in-memory tier. With directory set, results are
+    also written there as .crew session files and the max_disk_entries most
+    recently used ones are kept.
+    """
+    def __init__(self, max_entries=32, directory=None, max_disk_entries=256):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached GroupingResult for key, or None."""
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+        result = self._load(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._remember(key, result)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self._remember(key, result)
+        if self.directory is not None:
+            self._store(key, result)
+
+    def clear(self):
+        """Empty the in-memory tier (files on disk are kept)."""
+        self._entries.clear()
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ---------------- DISK TIER ----------------
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.crew")
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            result = session.load_session(path).result
+            os.utime(path)  # Mark as recently used.
+        except (OSError, session.SessionError):
+            return None
+        return result
+
+    def _store(self, key, result):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # The snapshot roster travels with the result, so the session's
+            # own roster is left empty.
+            session.save_session(self._path(key), Roster(), {}, result)
+            self._trim_disk()
+        except OSError:
+            pass  # The disk tier is best effort; the in-memory entry is enough.
+
+    def _trim_disk(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".crew"):
+                    entries.append((entry.stat().st_mtime, entry.path))
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_disk_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,50 @@
+"""Role names known to Crew Maker."""
+
+# A comprehensive list of roles
+ALL_ROLES = [
+    "DIRECTOR",
+    "PRODUCER",
+    "ASSOCIATE PRODUCER",
+    "EXECUTIVE PRODUCER",
+    "WRITER",
+    "SCREENWRITER",
+    "STORY DEVELOPER",
+    "DP",
+    "CAMERAMAN",
+    "GAFFER",
+    "BEST BOY",
+    "GRIP",
+    "KEY GRIP",
+    "ELECTRICIAN",
+    "SOUND MIXER",
+    "SOUND DESIGNER",
+    "SOUND RECORDIST",
+    "MAKEUP ARTIST",
+    "HAIR STYLIST",
+    "COSTUME DESIGNER",
+    "COSTUMER",
+    "ACTOR",
+    "SUPPORTING ACTOR",
+    "EXTRA",
+    "SCRIPT SUPERVISOR",
+    "ART DIRECTOR",
+    "PRODUCTION DESIGNER",
+    "SET DECORATOR",
+    "LOCATION MANAGER",
+    "PRODUCTION ASSISTANT",
+    "STUNT COORDINATOR",
+    "CHOREOGRAPHER",
+    "VISUAL EFFECTS SUPERVISOR",
+    "EDITOR",
+    "POST-PRODUCTION SUPERVISOR",
+    "COLORIST",
+    "COMPOSER",
+    "MUSIC SUPERVISOR",
+    "CREW"
+]
+
+# Set form of ALL_ROLES for constant-time validation of imported roles.
+ROLE_SET = frozenset(ALL_ROLES)
+
+# Role given to persons whose role is missing or unknown.
+DEFAULT_ROLE = "CREW"
@@ -0,0 +1,191 @@
+"""
+The in-memory list of persons edited by Crew Maker.
+
+The roster is plain data with no Tk dependency: the GUI only creates widgets
+for the rows that are on screen and reads and writes everything else here.
+
+Persons are stored column-wise: names in one list and roles as small integer
+IDs in a packed array. Role IDs index into role_names, which starts out as
+ALL_ROLES; roles typed in by hand that are not in ALL_ROLES are appended.
+
+Every person also gets a person ID (the ids column) that never changes while
+they are in the roster and is never reused. IDs are handed out in increasing
+order and rows are only ever appended, so ids is sorted and a person's row
+can be found with bisect. The roster also journals the IDs of everyone added,
+removed or edited, so code holding a snapshot from named() can find out what
+changed since without comparing whole rosters.
+"""
+from array import array
+from bisect import bisect_left
+
+from roles import ALL_ROLES, DEFAULT_ROLE
+
+
+class Roster:
+    """Persons stored as a name list and a role ID array, addressed by row index."""
+    def __init__(self, persons=()):
+        self.names = []
+        self.role_ids = array("H")
+        self.ids = array("Q")
+        self._next_id = 0
+        self._journal = array("Q")  # IDs of persons added, removed or edited, in order.
+        self._journal_token = object()
+        self.source_mark = None  # On snapshots: edit_mark() of the source roster when named() was called.
+        self.role_names = list(ALL_ROLES)
+        self._role_lookup = {role: i for i, role in enumerate(self.role_names)}
+        self._members = None  # Role ID -> array of row indices, built on demand.
+        self.extend(persons)
+
+    @classmethod
+    def from_columns(cls, names, role_ids, role_names, ids=None):
+        """Build a roster around existing columns without copying them (ids, if given, must be sorted)."""
+        roster = cls()
+        roster.names = names
+        roster.role_ids = role_ids
+        roster.role_names = role_names
+        roster._role_lookup = {role: i for i, role in enumerate(role_names)}
+        roster.ids = ids if ids is not None else array("Q", range(len(names)))
+        roster._next_id = roster.ids[-1] + 1 if roster.ids else 0
+        return roster
+
+    def __len__(self):
+        return len(self.names)
+
+    # ---------------- ROLES ----------------
+    def role_id(self, role):
+        """Return the ID of role, interning it if it has not been seen before."""
+        role_id = self._role_lookup.get(role)
+        if role_id is None:
+            role_id = len(self.role_names)
+            self.role_names.append(role)
+            self._role_lookup[role] = role_id
+        return role_id
+
+    def role(self, index):
+        return self.role_names[self.role_ids[index]]
+
+    def members(self, role):
+        """Return the row indices of everyone with the given role, in roster order."""
+        if self._members is None:
+            members = [array("I") for _ in self.role_names]
+            for index, role_id in enumerate(self.role_ids):
+                members[role_id].append(index)
+            self._members = members
+        role_id = self._role_lookup.get(role)
+        if role_id is None or role_id >= len(self._members):
+            return array("I")
+        return self._members[role_id]
+
+    def count(self, role):
+        return len(self.members(role))
+
+    # ---------------- PERSON IDS ----------------
+    def row_of(self, person_id):
+        """Return the row index of person_id, or None if they are not in the roster."""
+        row = bisect_left(self.ids, person_id)
+        if row < len(self.ids) and self.ids[row] == person_id:
+            return row
+        return None
+
+    def edit_mark(self):
+        """Return a marker for the current state, for edited_since()."""
+        return self._journal_token, len(self._journal)
+
+    def edited_since(self, mark):
+        """
+        Return the set of person IDs added, removed or edited since mark.
+
+        Returns None when mark is None or came from another roster.
+        """
+        if mark is None or mark[0] is not self._journal_token:
+            return None
+        return set(self._journal[mark[1]:])
+
+    def journal_since(self, mark, limit=None):
+        """
+        Return (IDs journaled since mark, in order, the mark just after them).
+
+        With limit, at most limit IDs are returned, so a long journal can be
+        read a slice at a time. An ID appears once per edit. Returns
+        (None, None) when mark is None or came from another roster.
+        """
+        if mark is None or mark[0] is not self._journal_token:
+            return None, None
+        end = len(self._journal) if limit is None else min(len(self._journal), mark[1] + limit)
+        return self._journal[mark[1]:end], (self._journal_token, end)
+
+    # ---------------- EDITING ----------------
+    def add(self, name="", role=DEFAULT_ROLE):
+        """Append one person and return its row index."""
+        self.names.append(name)
+        self.role_ids.append(self.role_id(role))
+        self.ids.append(self._next_id)
+        self._journal.append(self._next_id)
+        self._next_id += 1
+        self._members = None
+        return len(self.names) - 1
+
+    def extend(self, persons):
+        """Append (name, role) pairs."""
+        role_id = self.role_id
+        start = len(self.names)
+        for name, role in persons:
+            self.names.append(name)
+            self.role_ids.append(role_id(role))
+        new_ids = range(self._next_id, self._next_id + len(self.names) - start)
+        self.ids.extend(new_ids)
+        self._journal.extend(new_ids)
+        self._next_id += len(new_ids)
+        self._members = None
+
+    def remove(self, index):
+        self._journal.append(self.ids[index])
+        del self.names[index]
+        del self.role_ids[index]
+        del self.ids[index]
+        self._members = None
+
+    def clear(self):
+        self._journal.extend(self.ids)
+        self.names.clear()
+        del self.role_ids[:]
+        del self.ids[:]
+        self._members = None
+
+    def set_name(self, index, name):
+        if self.names[index] != name:
+            self.names[index] = name
+            self._journal.append(self.ids[index])
+
+    def set_role(self, index, role):
+        role_id = self.role_id(role.strip())
+        if self.role_ids[index] != role_id:
+            self.role_ids[index] = role_id
+            self._journal.append(self.ids[index])
+            self._members = None
+
+    def get(self, index):
+        return {
+            "name": self.names[index].strip(),
+            "role": self.role(index)
+        }
+
+    def named(self):
+        """
+        Return a new roster with only the persons that have a name, names stripped.
+
+        The snapshot's source_mark is this roster's edit_mark(), or, when this
+        roster is itself a snapshot, the mark of the roster it was taken from.
+        """
+        snapshot = Roster()
+        snapshot.role_names = list(self.role_names)
+        snapshot._role_lookup = dict(self._role_lookup)
+        snapshot._next_id = self._next_id
+        snapshot.source_mark = self.source_mark if self.source_mark is not None else self.edit_mark()
+        for name, role_id, person_id in zip(self.names, self.role_ids, self.ids):
+            name = name.strip()
+            if name:
+                snapshot.names.append(name)
+                snapshot.role_ids.append(role_id)
+                snapshot.ids.append(person_id)
+        return snapshot
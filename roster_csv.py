@@ -0,0 +1,61 @@
+"""
+Streaming reader for roster CSV files.
+
+Files are parsed lazily in chunks so that large rosters can be read on a worker
+thread and handed to the GUI a batch at a time.
+"""
+import csv
+import io
+import os
+
+from roles import DEFAULT_ROLE, ROLE_SET
+
+
+def iter_csv_chunks(file_path, chunk_size=5000):
+    """
+    Yield (persons, bytes_read, total_bytes) for each chunk of a roster CSV.
+
+    persons is a list of (name, role) tuples. The first column is the name and
+    the second the role; roles that are empty or not in ALL_ROLES become CREW.
+    Blank lines are skipped.
+    """
+    total_bytes = os.path.getsize(file_path)
+    with open(file_path, "rb") as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        persons = []
+        for person in parse_rows(csv.reader(text)):
+            persons.append(person)
+            if len(persons) >= chunk_size:
+                yield persons, raw.tell(), total_bytes
+                persons = []
+        if persons:
+            yield persons, total_bytes, total_bytes
+
+
+def parse_rows(rows):
+    """
+    Yield a (name, role) tuple for each row (a sequence of strings), as Import CSV reads them.
+
+    Blank rows are skipped and roles that are empty or not in ALL_ROLES become CREW.
+    """
+    for row in rows:
+        if not row:
+            continue
+        name = row[0].strip()
+        role = row[1].strip() if len(row) > 1 else ""
+        if role not in ROLE_SET:
+            role = DEFAULT_ROLE
+        yield name, role
+
+
+def parse_csv_text(text):
+    """Parse roster CSV held in a string into a list of (name, role) tuples."""
+    return list(parse_rows(csv.reader(io.StringIO(text, newline=""))))
+
+
+def read_csv(file_path):
+    """Read a whole roster CSV into a list of (name, role) tuples."""
+    persons = []
+    for chunk, _, _ in iter_csv_chunks(file_path):
+        persons.extend(chunk)
+    return persons
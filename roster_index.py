@@ -0,0 +1,235 @@
+"""
+A live index over a Roster for search, duplicate names and role statistics.
+
+RosterIndex keeps, for everyone with a name, a normalized name -> person map,
+a role -> count histogram and the set of names held by more than one person.
+It follows the roster through its edit journal (see Roster.edited_since):
+sync() looks only at the people added, removed or edited since the last
+sync, so it can run after every keystroke or import batch. sync(limit) does
+a bounded amount of work, so indexing a large roster or import can be
+spread over many short steps.
+
+Counts match what generate_groups sees: only persons with a non-blank name
+are counted. Names are compared ignoring case, Unicode compatibility forms
+and repeated or surrounding spaces, so "Ana  Smith" and "ana smith" are the
+same person for duplicate warnings and search.
+"""
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
+
+from constraints import feasible_group_range, merge_constraints
+
+
+def normalize_name(name):
+    """Return name as compared by the index ("" for a blank name)."""
+    if name.isascii():
+        return " ".join(name.lower().split())
+    return " ".join(unicodedata.normalize("NFKC", name).casefold().split())
+
+
+class RosterIndex:
+    """
+    Search, duplicate and role statistics for roster, kept up to date by sync().
+
+    len(index) and index.count(role) mirror Roster's, but only count named
+    persons, so the index can be passed to constraints.feasible_group_range.
+    """
+    def __init__(self, roster):
+        self.roster = roster
+        self.rebuild()
+
+    def reset(self):
+        """Forget everything; the following syncs index the whole roster again."""
+        self._mark = self.roster.edit_mark()
+        self._cursor = 0  # While walking the rows: the lowest person ID not indexed yet, else None.
+        self._end = 0  # Persons with this ID or higher were added after the last walk.
+        self._entries = {}  # Person ID -> (normalized name, role).
+        self._by_name = {}  # Normalized name -> person ID, or a set of IDs when shared.
+        # Normalized names held by more than one person, in the order they became
+        # shared (a dict used as an ordered set), and how many extra holders they have.
+        self._duplicates = {}
+        self._duplicate_persons = 0
+        self._role_counts = Counter()
+
+    def rebuild(self):
+        """Index the whole roster from scratch."""
+        self.reset()
+        self.sync()
+
+    @property
+    def ready(self):
+        """Whether the index reflects every edit made to the roster so far."""
+        return self._cursor is None and self._mark == self.roster.edit_mark()
+
+    def sync(self, limit=None):
+        """
+        Apply the roster's edits since the last sync. Returns True if anything changed.
+
+        With limit, at most limit journal entries and limit rows are looked
+        at, so a large rebuild or import can be spread over several calls
+        (see ready). A roster that was replaced (roster assigned a different
+        Roster) is indexed again from scratch.
+        """
+        journal, mark = self.roster.journal_since(self._mark, limit)
+        updated = journal is None
+        if journal is None:
+            self.reset()
+        else:
+            self._mark = mark
+            for person_id in journal:
+                if self._cursor is not None:
+                    if person_id >= self._cursor:
+                        continue  # The walk will index them as they are then.
+                elif person_id >= self._end:
+                    # Added since the last walk (IDs only grow): walking the
+                    # rows from here is cheaper than looking each one up.
+                    self._cursor = person_id
+                    continue
+                updated |= self._reindex(person_id)
+        if self._cursor is not None:
+            updated |= self._walk(len(self.roster) if limit is None else limit) > 0
+        return updated
+
+    def _walk(self, limit):
+        # Rows are walked by person ID rather than position, so edits and
+        # removals between calls cannot make the walk skip or repeat anyone.
+        roster = self.roster
+        start = bisect_left(roster.ids, self._cursor)
+        stop = min(len(roster), start + limit)
+        role_names = roster.role_names
+        for name, role_id, person_id in zip(roster.names[start:stop], roster.role_ids[start:stop],
+                                            roster.ids[start:stop]):
+            key = normalize_name(name)
+            if key:
+                self._add(person_id, key, role_names[role_id])
+        if stop < len(roster):
+            self._cursor = roster.ids[stop]
+        else:
+            self._cursor = None
+            if len(roster):
+                self._end = max(self._end, roster.ids[-1] + 1)
+        return stop - start
+
+    def _reindex(self, person_id):
+        roster = self.roster
+        row = roster.row_of(person_id)
+        new = None
+        if row is not None:
+            key = normalize_name(roster.names[row])
+            if key:
+                new = (key, roster.role(row))
+        old = self._entries.get(person_id)
+        if old == new:
+            return False
+        if old is not None:
+            self._discard(person_id, *old)
+        if new is not None:
+            self._add(person_id, *new)
+        return True
+
+    def _add(self, person_id, key, role):
+        self._entries[person_id] = (key, role)
+        self._role_counts[role] += 1
+        holders = self._by_name.get(key)
+        if holders is None:
+            self._by_name[key] = person_id
+        elif isinstance(holders, set):
+            holders.add(person_id)
+            self._duplicate_persons += 1
+        else:
+            self._by_name[key] = {holders, person_id}
+            self._duplicates[key] = None
+            self._duplicate_persons += 1
+
+    def _discard(self, person_id, key, role):
+        del self._entries[person_id]
+        self._role_counts[role] -= 1
+        if not self._role_counts[role]:
+            del self._role_counts[role]
+        holders = self._by_name[key]
+        if not isinstance(holders, set):
+            del self._by_name[key]
+            return
+        holders.discard(person_id)
+        self._duplicate_persons -= 1
+        if len(holders) == 1:
+            self._by_name[key] = holders.pop()
+            del self._duplicates[key]
+
+    # ---------------- STATISTICS ----------------
+    def __len__(self):
+        return len(self._entries)
+
+    def count(self, role):
+        return self._role_counts.get(role, 0)
+
+    def role_counts(self):
+        """Return {role: number of named persons}, most common first."""
+        return dict(self._role_counts.most_common())
+
+    def feasible_groups(self, min_group_size, require_writer=True, require_dp=True, constraints=None):
+        """
+        Return the constraints.GroupRange of group counts the roster can be split into.
+
+        high is the most groups generate_groups can make with these settings
+        and high_reason the rule that limits it (None when it is the number of
+        people).
+        """
+        rules = merge_constraints(constraints or [], require_writer, require_dp)
+        return feasible_group_range(self, min_group_size, rules)
+
+    # ---------------- NAMES ----------------
+    def _ids(self, key):
+        holders = self._by_name.get(key)
+        if holders is None:
+            return ()
+        return holders if isinstance(holders, set) else (holders,)
+
+    def rows_named(self, name):
+        """Return the rows of everyone whose name matches name, in roster order."""
+        return sorted(self.roster.row_of(person_id) for person_id in self._ids(normalize_name(name)))
+
+    def duplicates(self, limit=None):
+        """
+        Return [(name, rows), ...] for names held by more than one person, by first row.
+
+        With limit, only the first limit names to have become shared are
+        looked up, so a few examples cost the same however many duplicates
+        there are.
+        """
+        keys = self._duplicates if limit is None else islice(self._duplicates, limit)
+        row_of = self.roster.row_of
+        found = sorted(sorted(row_of(person_id) for person_id in self._ids(key)) for key in keys)
+        return [(self.roster.names[rows[0]].strip(), rows) for rows in found]
+
+    @property
+    def duplicate_names(self):
+        """How many names are held by more than one person."""
+        return len(self._duplicates)
+
+    @property
+    def duplicate_persons(self):
+        """How many persons would go if every duplicate name were kept once."""
+        return self._duplicate_persons
+
+    def search(self, text, limit=None):
+        """
+        Return the rows whose name contains text (compared like names), in roster order.
+
+        Blank text matches nobody. With limit, only the first limit rows are returned.
+        """
+        needle = normalize_name(text)
+        if not needle:
+            return []
+        row_of = self.roster.row_of
+        rows = []
+        for key, holders in self._by_name.items():
+            if needle in key:
+                if isinstance(holders, set):
+                    rows.extend(row_of(person_id) for person_id in holders)
+                else:
+                    rows.append(row_of(holders))
+        rows.sort()
+        return rows[:limit] if limit is not None else rows
@@ -0,0 +1,200 @@
+"""
+Multi-round scheduling that keeps people from meeting the same teammates.
+
+Each round starts from a normal generate_groups result, so the WRITER/DP
+toggles and role rules hold, and is then improved by swapping people between
+groups to cut repeat pairings. A swap only exchanges two people of the same
+constrained role, or two people whose roles have no rule, so group sizes and
+every per-role count stay exactly as generate_groups made them.
+
+The history is a co-membership matrix C (C[i, j] = rounds i and j have shared
+a group) kept in NumPy, together with P = C x membership (P[i, g] = how often
+i has already met the people in group g). The gain of swapping i and j is
+
+    P[i, a_i] + P[j, a_j] - P[i, a_j] - P[j, a_i] + 2 C[i, j]
+
+which is evaluated for a whole batch of people against a sample of up to
+max_partners swap partners in one vectorized expression; the best
+non-conflicting swaps are applied and P is updated a group at a time.
+
+Requires NumPy (pip install numpy).
+"""
+import random
+
+import grouping_engine
+from constraints import merge_constraints
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+
+class RoundSchedule:
+    """
+    The groupings for each round.
+
+    results holds one GroupingResult per round (all sharing one roster
+    snapshot); repeat_pairs[r] is how many pairs in round r had already been in
+    a group together in an earlier round.
+    """
+    def __init__(self, results, repeat_pairs):
+        self.results = results
+        self.repeat_pairs = repeat_pairs
+
+
+def schedule_rounds(roster, rounds, num_groups, min_group_size, require_writer=True, require_dp=True,
+                    constraints=None, seed=None, max_passes=8, batch_size=256, check_cancelled=None):
+    """
+    Generate `rounds` groupings of roster that minimise repeat pairings.
+
+    The settings are the same as for grouping_engine.generate_groups. seed makes
+    the whole schedule reproducible. Raises GroupingError like generate_groups.
+    """
+    if np is None:
+        raise ImportError("Multi-round scheduling requires NumPy (pip install numpy).")
+    rng = random.Random(seed)
+    snapshot = roster.named()
+    n = len(snapshot)
+    swap_class = _swap_classes(snapshot, merge_constraints(constraints or [], require_writer, require_dp))
+    history = np.zeros((n, n), dtype=np.uint8 if rounds < 256 else np.uint16)
+
+    results = []
+    repeat_pairs = []
+    for _ in range(rounds):
+        if check_cancelled is not None:
+            check_cancelled()
+        result = grouping_engine.generate_groups(
+            snapshot, num_groups, min_group_size, require_writer=require_writer, require_dp=require_dp,
+            rng=random.Random(rng.randrange(2 ** 32)), constraints=constraints,
+            check_cancelled=check_cancelled
+        )
+        assignment = np.full(n, -1, dtype=np.int64)
+        for g, group in enumerate(result.groups):
+            assignment[group] = g
+        missing = np.flatnonzero(assignment < 0)
+        if len(missing) or sum(map(len, result.groups)) != n:
+            # _improve and _groups_from_assignment need every row in exactly one group.
+            raise ValueError(f"generate_groups did not place every person exactly once "
+                             f"({len(missing)} of {n} rows in no group)")
+        if results:
+            _improve(history, assignment, result.num_groups, swap_class, rng, max_passes, batch_size,
+                     check_cancelled)
+
+        groups = _groups_from_assignment(assignment, result.num_groups)
+        repeats = 0
+        for group in groups:
+            block = history[np.ix_(group, group)]
+            repeats += int(np.count_nonzero(block)) // 2
+            history[np.ix_(group, group)] = block + 1
+        np.fill_diagonal(history, 0)
+
+        results.append(grouping_engine.GroupingResult(result.roster, groups, result.num_groups, result.notices))
+        repeat_pairs.append(repeats)
+    return RoundSchedule(results, repeat_pairs)
+
+
+def _swap_classes(roster, constraints):
+    """Return an array giving each person's swap class (-1 for roles without a rule)."""
+    constrained = {roster.role_id(c.role) for c in constraints}
+    role_ids = np.frombuffer(roster.role_ids, dtype=np.uint16).astype(np.int64)
+    classes = np.full(len(roster), -1, dtype=np.int64)
+    for role_id in constrained:
+        classes[role_ids == role_id] = role_id
+    return classes
+
+
+def _groups_from_assignment(assignment, num_groups):
+    order = np.argsort(assignment, kind="stable")
+    counts = np.bincount(assignment, minlength=num_groups)
+    bounds = np.cumsum(counts)[:-1]
+    return [part.tolist() for part in np.split(order, bounds)]
+
+
+def _improve(history, assignment, num_groups, swap_class, rng, max_passes, batch_size, check_cancelled,
+             max_partners=1024, min_gain=0.01):
+    """Swap people between groups, in place in assignment, while it reduces repeat pairings."""
+    n = len(assignment)
+    everyone = np.arange(n)
+    sampler = np.random.default_rng(rng.randrange(2 ** 32))
+    # meet[g, i]: how many times i has met the current members of group g.
+    # Stored group-major so that the per-group updates and lookups are row operations.
+    order = np.argsort(assignment, kind="stable")
+    starts = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=num_groups))[:-1]))
+    meet = np.ascontiguousarray(np.add.reduceat(history[:, order], starts, axis=1, dtype=np.int32).T)
+    members_by_class = {c: np.flatnonzero(swap_class == c) for c in np.unique(swap_class)}
+    # A batch can apply at most num_groups / 2 swaps, so larger batches only
+    # waste work when there are few groups.
+    batch_size = max(1, min(batch_size, num_groups))
+
+    for _ in range(max_passes):
+        if check_cancelled is not None:
+            check_cancelled()
+        own = meet[assignment, everyone]
+        cost = int(own.sum())
+        candidates = np.flatnonzero(own > 0)
+        if not len(candidates):
+            return
+        candidates = sampler.permutation(candidates)
+        for start in range(0, len(candidates), batch_size):
+            batch = candidates[start:start + batch_size]
+            own = meet[assignment, everyone]
+            touched = np.zeros(num_groups, dtype=bool)
+            swaps = []
+            for c in np.unique(swap_class[batch]):
+                rows = batch[swap_class[batch] == c]
+                partners = members_by_class[c]
+                if len(partners) > max_partners:
+                    partners = np.sort(sampler.choice(partners, max_partners, replace=False))
+                swaps.extend(_choose_swaps(history, meet, own, assignment, rows, partners, touched))
+            if swaps:
+                _apply_swaps(history, meet, assignment, swaps)
+        # Stop once a full pass no longer makes a meaningful difference.
+        if cost - int(meet[assignment, everyone].sum()) <= cost * min_gain:
+            return
+
+
+def _choose_swaps(history, meet, own, assignment, rows, partners, touched):
+    """
+    Pick improving (i, j, a_i, a_j) swaps between rows and partners.
+
+    The gain of a swap only depends on the two groups involved, so gains stay
+    exact as long as no chosen swap shares a group. Each round of selection
+    takes every row's best partner, keeps the best non-conflicting ones, then
+    masks out the groups they touched and looks again.
+    """
+    a_rows = assignment[rows]
+    a_partners = assignment[partners]
+    gain = (own[rows][:, None] + own[partners][None, :]
+            - np.take(meet[:, rows], a_partners, axis=0).T
+            - np.take(meet[a_rows], partners, axis=1)
+            + 2 * history[rows][:, partners].astype(np.int32))
+    gain[a_rows[:, None] == a_partners[None, :]] = 0
+    gain[touched[a_rows]] = 0
+    gain[:, touched[a_partners]] = 0
+
+    chosen = []
+    while True:
+        best = gain.argmax(axis=1)
+        best_gain = gain[np.arange(len(rows)), best]
+        improving = np.flatnonzero(best_gain > 0)
+        if not len(improving):
+            return chosen
+        for k in improving[np.argsort(-best_gain[improving], kind="stable")]:
+            a, b = a_rows[k], a_partners[best[k]]
+            if touched[a] or touched[b]:
+                continue
+            touched[a] = touched[b] = True
+            chosen.append((rows[k], partners[best[k]], a, b))
+        gain[touched[a_rows]] = 0
+        gain[:, touched[a_partners]] = 0
+
+
+def _apply_swaps(history, meet, assignment, swaps):
+    """Apply non-conflicting swaps and update the group-major meet counts."""
+    i_idx, j_idx, a_idx, b_idx = (np.array(column) for column in zip(*swaps))
+    delta = history[j_idx].astype(np.int32) - history[i_idx].astype(np.int32)
+    meet[a_idx] += delta
+    meet[b_idx] -= delta
+    assignment[i_idx] = b_idx
+    assignment[j_idx] = a_idx
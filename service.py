@@ -0,0 +1,504 @@
+"""
+A local grouping service for other tools.
+
+Serves grouping_engine.generate_groups over a small HTTP/1.1 server on
+localhost (or a Unix socket), so tools get exactly the groups the app and
+crewmaker_cli.py make for the same roster, settings and seed, without Tk.
+It uses only the standard library and never talks to anything but its own
+clients.
+
+    python service.py                                  # http://127.0.0.1:8765
+    python service.py --socket /tmp/crewmaker.sock --workers 4
+
+POST /groups with a JSON object:
+
+    roster          one of "csv" (roster CSV text, read like Import CSV),
+                    "persons" ([[name, role], ...]) or "roster_hash" (from an
+                    earlier response, to skip sending the roster again)
+    num_groups      default 2
+    min_group_size  default 2
+    require_writer, require_dp   default true
+    rules           [{"role": "DIRECTOR", "minimum": 1, "maximum": null}, ...]
+    seed            default random; the seed used is returned
+    format          "json" (default), or "text", "csv" or "jsonl" for the
+                    same output as Export Groups
+
+The JSON response has roster_hash, seed, num_groups, groups (a list of
+[{"name", "role"}, ...] per group), notices and cached. Grouping errors come
+back as 422 with "error" (the title) and "message". GET /health returns
+counters.
+
+Requests that arrive within batch_window of each other are collected and
+sent to the worker pool as one job per roster, so many small requests share
+one trip to a worker process. Parsed rosters are kept by a hash of their
+payload, here and in each worker, so a batch only carries the roster to a
+worker that does not have it yet. Results are kept by roster, settings and
+seed (as in the app), and identical requests in flight at the same time are
+computed once.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import random
+import signal
+import sys
+from collections import OrderedDict
+
+import grouping_engine
+import perf
+from constraints import RoleConstraint
+from export import write_groups
+from result_cache import ResultCache, cache_key, roster_fingerprint
+from roster import Roster
+from roster_csv import parse_csv_text, parse_rows
+
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 256 * 2 ** 20
+_INLINE_ROWS = 10000  # Larger rosters are parsed and formatted off the event loop.
+
+_CONTENT_TYPES = {
+    "json": "application/json",
+    "text": "text/plain; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error"}
+
+
+class ServiceError(Exception):
+    """A request the service cannot answer; status is the HTTP status to send."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ---------------- WORKER PROCESS ----------------
+# Each worker keeps the rosters it has been sent, by payload hash, so later
+# batches for the same roster only send the hash.
+_worker_rosters = OrderedDict()
+_worker_max_rosters = 0
+
+
+def _init_worker(max_rosters):
+    global _worker_max_rosters
+    _worker_max_rosters = max_rosters
+
+
+def _run_jobs(key, columns, jobs):
+    """
+    Run (num_groups, min_group_size, options, seed) jobs on the roster stored under key.
+
+    columns is (names, role_ids, role_names), or None to use the roster this
+    worker already holds; then None is returned if it does not have it.
+    Otherwise returns, per job, (groups, num_groups, notices) or
+    ("error", title, message).
+    """
+    roster = _worker_rosters.get(key)
+    if roster is not None:
+        _worker_rosters.move_to_end(key)
+    elif columns is None:
+        return None
+    else:
+        roster = _worker_rosters[key] = Roster.from_columns(*columns)
+        while len(_worker_rosters) > _worker_max_rosters:
+            _worker_rosters.popitem(last=False)
+    outcomes = []
+    for num_groups, min_group_size, options, seed in jobs:
+        try:
+            result = grouping_engine.generate_groups(roster, num_groups, min_group_size,
+                                                     rng=random.Random(seed), **options)
+        except grouping_engine.GroupingError as e:
+            outcomes.append(("error", e.title, e.message))
+            continue
+        outcomes.append((result.groups, result.num_groups, result.notices))
+    return outcomes
+
+
+class _Roster:
+    """A parsed roster (a named() snapshot) and its fingerprint."""
+    def __init__(self, key, roster):
+        self.key = key
+        self.roster = roster
+        self.fingerprint = roster_fingerprint(roster)
+        self.sent = False  # Whether a worker has been sent the columns yet.
+
+
+class _Job:
+    def __init__(self, entry, job, future):
+        self.entry = entry
+        self.job = job
+        self.future = future
+
+
+# ---------------- SERVICE ----------------
+class GroupingService:
+    """
+    Generates groups for JSON requests, batching them onto a worker pool.
+
+    max_workers processes run the grouping (default: one per CPU);
+    max_workers=1 uses a single thread in this process instead. Call start()
+    inside a running event loop, then generate() or serve connections with
+    handle_connection().
+    """
+    def __init__(self, max_workers=None, batch_window=0.005, max_batch=64, max_rosters=32,
+                 cache_entries=256, cache_dir=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_rosters = max_rosters
+        self.results = ResultCache(max_entries=cache_entries, directory=cache_dir)
+        self._rosters = OrderedDict()  # Payload hash -> _Roster.
+        self._in_flight = {}  # Cache key -> future of the job computing it.
+        self._queue = None
+        self._executor = None
+        self._batcher = None
+        self._batches = set()
+        self.requests = 0
+        self.batches = 0
+
+    async def start(self):
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        if self.max_workers <= 1:
+            self._executor = ThreadPoolExecutor(max_workers=1, initializer=_init_worker,
+                                                initargs=(self.max_rosters,))
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                                 initargs=(self.max_rosters,))
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        return self
+
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "rosters": len(self._rosters),
+            "cache_hits": self.results.hits,
+            "cache_misses": self.results.misses,
+            "workers": self.max_workers,
+        }
+
+    # ---------- Requests ----------
+    async def generate(self, request):
+        """Answer one /groups request (a dict); returns (content type, body bytes)."""
+        self.requests += 1
+        with perf.span("service.request"):
+            entry = await self._roster(request)
+            num_groups = _integer(request, "num_groups", 2)
+            min_group_size = _integer(request, "min_group_size", 2)
+            options = {
+                "require_writer": bool(request.get("require_writer", True)),
+                "require_dp": bool(request.get("require_dp", True)),
+                "constraints": _rules(request.get("rules", [])),
+            }
+            seed = request.get("seed")
+            if seed is None:
+                seed = random.randrange(2 ** 32)
+            elif not isinstance(seed, int) or isinstance(seed, bool):
+                raise ServiceError(400, "seed must be an integer.")
+            output = request.get("format", "json")
+            if output not in _CONTENT_TYPES:
+                raise ServiceError(400, f"format must be one of {', '.join(_CONTENT_TYPES)}.")
+
+            key = cache_key(entry.fingerprint, num_groups, min_group_size, seed=seed, **options)
+            result = self.results.get(key)
+            cached = result is not None
+            if result is None:
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+                    future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+                    self._queue.put_nowait(_Job(entry, (num_groups, min_group_size, options, seed), future))
+                outcome = await asyncio.shield(future)
+                if outcome[0] == "error":
+                    raise grouping_engine.GroupingError(outcome[1], outcome[2])
+                result = grouping_engine.GroupingResult(entry.roster, *outcome)
+                self.results.put(key, result)
+
+            if len(entry.roster) > _INLINE_ROWS:
+                body = await asyncio.to_thread(_format, result, output, entry.key, seed, cached)
+            else:
+                body = _format(result, output, entry.key, seed, cached)
+            return _CONTENT_TYPES[output], body
+
+    async def _roster(self, request):
+        """Return the _Roster for a request's csv, persons or roster_hash."""
+        if "roster_hash" in request:
+            entry = self._rosters.get(request["roster_hash"])
+            if entry is None:
+                raise ServiceError(404, "Unknown roster_hash; send the roster again.")
+            self._rosters.move_to_end(entry.key)
+            return entry
+
+        if "csv" in request:
+            text = request["csv"]
+            if not isinstance(text, str):
+                raise ServiceError(400, "csv must be a string.")
+            payload = text.encode("utf-8", "surrogatepass")
+            parse = lambda: parse_csv_text(text)  # noqa: E731
+        elif "persons" in request:
+            persons = request["persons"]
+            if not isinstance(persons, list) or not all(
+                    isinstance(row, list) and all(isinstance(value, str) for value in row) for row in persons):
+                raise ServiceError(400, "persons must be a list of [name, role] lists of strings.")
+            payload = json.dumps(persons, ensure_ascii=False, separators=(",", ":")).encode("utf-8", "surrogatepass")
+            parse = lambda: list(parse_rows(persons))  # noqa: E731
+        else:
+            raise ServiceError(400, "Send the roster as csv, persons or roster_hash.")
+
+        key = hashlib.blake2b(payload, digest_size=20).hexdigest()
+        entry = self._rosters.get(key)
+        if entry is None:
+            if len(payload) > _INLINE_ROWS * 16:
+                entry = await asyncio.to_thread(lambda: _Roster(key, Roster(parse()).named()))
+            else:
+                entry = _Roster(key, Roster(parse()).named())
+            self._rosters[key] = entry
+            while len(self._rosters) > self.max_rosters:
+                self._rosters.popitem(last=False)
+        else:
+            self._rosters.move_to_end(key)
+        return entry
+
+    # ---------- Batching ----------
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(pending) < self.max_batch:
+                try:
+                    pending.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            by_roster = {}
+            for job in pending:
+                by_roster.setdefault(job.entry.key, []).append(job)
+            for jobs in by_roster.values():
+                task = asyncio.create_task(self._run_batch(jobs))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, jobs):
+        self.batches += 1
+        perf.gauge("service.batch_size", len(jobs))
+        entry = jobs[0].entry
+        roster = entry.roster
+        columns = (roster.names, roster.role_ids, roster.role_names)
+        loop = asyncio.get_running_loop()
+        try:
+            with perf.span("service.batch") as span:
+                span.add(len(jobs))
+                batch = [job.job for job in jobs]
+                # Once a worker has the roster, try the hash alone; a worker
+                # that has not seen it (or dropped it) asks for the columns.
+                outcomes = None
+                if entry.sent:
+                    outcomes = await loop.run_in_executor(self._executor, _run_jobs, entry.key, None, batch)
+                if outcomes is None:
+                    perf.count("service.roster_sent")
+                    outcomes = await loop.run_in_executor(self._executor, _run_jobs, entry.key, columns, batch)
+                    entry.sent = True
+        except Exception as e:
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+        for job, outcome in zip(jobs, outcomes):
+            if not job.future.done():
+                job.future.set_result(outcome)
+
+    # ---------- HTTP ----------
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await _respond(writer, 400, "application/json", _error_body("Malformed request line."))
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY_BYTES:
+                    await _respond(writer, 413 if length > 0 else 400, "application/json",
+                                   _error_body("Missing or too large Content-Length."))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, content_type, data = await self._dispatch(method, target, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await _respond(writer, status, content_type, data, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, body):
+        path = target.split("?", 1)[0]
+        if path == "/health":
+            if method != "GET":
+                return 405, "application/json", _error_body("Use GET.")
+            stats = dict(self.stats(), status="ok")
+            return 200, "application/json", json.dumps(stats).encode("utf-8")
+        if path != "/groups":
+            return 404, "application/json", _error_body(f"No such endpoint: {path}")
+        if method != "POST":
+            return 405, "application/json", _error_body("Use POST.")
+        try:
+            request = json.loads(body)
+            if not isinstance(request, dict):
+                raise ServiceError(400, "The request body must be a JSON object.")
+            content_type, data = await self.generate(request)
+            return 200, content_type, data
+        except ValueError as e:
+            return 400, "application/json", _error_body(f"Invalid request: {e}")
+        except ServiceError as e:
+            return e.status, "application/json", _error_body(e.message)
+        except grouping_engine.GroupingError as e:
+            return 422, "application/json", json.dumps({"error": e.title, "message": e.message}).encode("utf-8")
+        except Exception as e:
+            return 500, "application/json", _error_body(f"{type(e).__name__}: {e}")
+
+
+def _integer(request, name, default):
+    value = request.get(name, default)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ServiceError(400, f"{name} must be an integer.")
+    return value
+
+
+def _rules(rules):
+    if not isinstance(rules, list):
+        raise ServiceError(400, "rules must be a list.")
+    try:
+        return [RoleConstraint(rule["role"], minimum=rule.get("minimum", 0), maximum=rule.get("maximum"))
+                for rule in rules]
+    except (KeyError, TypeError, AttributeError):
+        raise ServiceError(400, 'Each rule must be an object like {"role": "ACTOR", "minimum": 0, "maximum": 3}.')
+
+
+def _format(result, output, roster_hash, seed, cached):
+    if output != "json":
+        out = io.StringIO()
+        write_groups(result, out, output)
+        return out.getvalue().encode("utf-8")
+    return json.dumps({
+        "roster_hash": roster_hash,
+        "seed": seed,
+        "num_groups": result.num_groups,
+        "groups": [[{"name": name, "role": role} for name, role in result.members(group)]
+                   for group in result.groups],
+        "notices": [{"kind": notice.kind, "message": notice.message, "role": notice.role}
+                    for notice in result.notices],
+        "cached": cached,
+    }, ensure_ascii=False).encode("utf-8")
+
+
+def _error_body(message):
+    return json.dumps({"error": message}).encode("utf-8")
+
+
+async def _respond(writer, status, content_type, data, keep_alive=False):
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + data)
+    await writer.drain()
+
+
+# ---------------- COMMAND LINE ----------------
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, socket_path=None, ready=None, **options):
+    """Run the service until cancelled (or sent SIGTERM); ready(address) is called once it is listening."""
+    service = await GroupingService(**options).start()
+    try:
+        # Without this, SIGTERM would end the process without shutting down
+        # the pool, and the worker processes would be left running.
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (AttributeError, NotImplementedError):  # No SIGTERM handlers on Windows.
+        pass
+    try:
+        if socket_path:
+            server = await asyncio.start_unix_server(service.handle_connection, path=socket_path)
+            address = socket_path
+        else:
+            server = await asyncio.start_server(service.handle_connection, host, port)
+            bound_host, bound_port = server.sockets[0].getsockname()[:2]
+            address = f"http://{bound_host}:{bound_port}"
+        if ready is not None:
+            ready(address)
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Crew Maker grouping to local tools over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="TCP port, 0 for any free one (default: %(default)s)")
+    parser.add_argument("--socket", default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="grouping processes (default: one per CPU; 1 runs in-process)")
+    parser.add_argument("--batch-window-ms", type=float, default=5.0,
+                        help="how long to collect requests into one batch (default: %(default)s)")
+    parser.add_argument("--max-batch", type=int, default=64, help="most requests per batch (default: %(default)s)")
+    parser.add_argument("--cache-dir", default=None, help="also keep results in this directory")
+    args = parser.parse_args(argv)
+
+    perf.enable_from_environment()
+    try:
+        asyncio.run(serve(
+            args.host, args.port, args.socket,
+            ready=lambda address: print(f"Listening on {address}", file=sys.stderr, flush=True),
+            max_workers=args.workers, batch_window=args.batch_window_ms / 1000,
+            max_batch=args.max_batch, cache_dir=args.cache_dir,
+        ))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    finally:
+        perf.finish(sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
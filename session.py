@@ -0,0 +1,313 @@
+"""
+Crew Maker session files (.crew).
+
+A session holds everything needed to pick up where you left off: the roster,
+the group settings and the last generated groups. The roster is stored by
+column so that a large session opens without parsing it row by row:
+
+    magic        8 bytes, b"CREWSES1"
+    header size  4 bytes, little-endian unsigned
+    header       UTF-8 JSON: settings, role tables and section lengths
+    sections     each padded to a multiple of 8 bytes, little-endian:
+                   role IDs      uint16 per person
+                   person IDs    uint64 per person (see Roster.ids)
+                   name offsets  uint64 per person, plus one (end of the blob)
+                   names         UTF-8 blob, name i is blob[offsets[i]:offsets[i + 1]]
+                 and, when groups were saved, the same four sections for the
+                 snapshot roster the groups index into, followed by
+                   group bounds  uint64 per group, plus one
+                   members       uint32 row indices, group g is members[bounds[g]:bounds[g + 1]]
+
+load_session maps the file with mmap. Role IDs, person IDs and groups are
+copied into ordinary arrays (a few bytes per person), but names stay in the
+mapping and are decoded only when read, so opening a million-person session
+only touches the rows that are shown. Editing a roster loaded this way copies
+its names into a list first.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import MutableSequence
+from itertools import accumulate
+
+from constraints import RoleConstraint
+from grouping_engine import GroupingResult, Notice
+from roster import Roster
+
+MAGIC = b"CREWSES1"
+VERSION = 2
+_HEADER_SIZE = struct.Struct("<I")
+
+
+class SessionError(Exception):
+    """Raised when a file is not a session file this version can read."""
+
+
+class Session:
+    """
+    A loaded session.
+
+    settings is a dict with num_groups, min_group_size, require_writer,
+    require_dp, candidates, seed and constraints (a list of RoleConstraints); keys
+    missing from the file are left out. result is the saved GroupingResult, or
+    None when no groups were saved.
+    """
+    def __init__(self, roster, settings, result=None):
+        self.roster = roster
+        self.settings = settings
+        self.result = result
+
+
+class MappedNames(MutableSequence):
+    """
+    The names column of a roster loaded from a session file.
+
+    Names are decoded from the mapped file on access. The first change copies
+    every name into a list and the mapping is no longer used.
+    """
+    def __init__(self, buffer, offsets, blob_start, source=None):
+        self.source = source
+        self._buffer = buffer
+        self._offsets = offsets
+        self._blob_start = blob_start
+        self._length = len(offsets) - 1
+        self._list = None
+
+    def __len__(self):
+        if self._list is not None:
+            return len(self._list)
+        return self._length
+
+    def __getitem__(self, index):
+        if self._list is not None:
+            return self._list[index]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("name index out of range")
+        start = self._blob_start
+        return self._buffer[start + self._offsets[index]:start + self._offsets[index + 1]].decode("utf-8")
+
+    def __iter__(self):
+        if self._list is not None:
+            return iter(self._list)
+        return self._iter_mapped()
+
+    def _iter_mapped(self):
+        buffer = self._buffer
+        start = self._blob_start
+        offsets = self._offsets
+        for i in range(self._length):
+            yield buffer[start + offsets[i]:start + offsets[i + 1]].decode("utf-8")
+
+    @property
+    def mapped(self):
+        """True while names are still read from the file."""
+        return self._list is None
+
+    def blob(self):
+        """Return (offsets, UTF-8 bytes) for all names, straight from the file."""
+        start = self._blob_start
+        return self._offsets, self._buffer[start:start + self._offsets[self._length]]
+
+    def materialize(self):
+        """Copy the names into a list and stop using the mapping."""
+        if self._list is None:
+            self._list = list(self._iter_mapped())
+            self._buffer = self._offsets = None
+
+    def __setitem__(self, index, value):
+        self.materialize()
+        self._list[index] = value
+
+    def __delitem__(self, index):
+        self.materialize()
+        del self._list[index]
+
+    def insert(self, index, value):
+        self.materialize()
+        self._list.insert(index, value)
+
+    def clear(self):
+        self._list = []
+        self._buffer = self._offsets = None
+
+
+# ---------------- SAVING ----------------
+def save_session(path, roster, settings, result=None):
+    """
+    Write roster, settings and, optionally, a GroupingResult to path.
+
+    The file is written next to path and moved into place, so a failed save
+    leaves any earlier session intact.
+    """
+    header = {"version": VERSION, "settings": _settings_to_json(settings)}
+    sections = []
+    header["roster"] = _roster_sections(roster, sections)
+    if result is not None:
+        bounds = array("Q", [0])
+        bounds.extend(accumulate(len(group) for group in result.groups))
+        members = array("I")
+        for group in result.groups:
+            members.extend(group)
+        header["result"] = {
+            "roster": _roster_sections(result.roster, sections),
+            "num_groups": result.num_groups,
+            "notices": [_notice_to_json(notice) for notice in result.notices],
+            "groups": len(result.groups),
+        }
+        sections.append(_little_endian(bounds))
+        sections.append(_little_endian(members))
+
+    # A roster still read from this very file must be copied out of the
+    # mapping before the file is replaced.
+    target = os.path.abspath(path)
+    for column in (roster.names, result.roster.names if result is not None else None):
+        if isinstance(column, MappedNames) and column.source == target:
+            column.materialize()
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_SIZE.pack(len(header_bytes)))
+        f.write(header_bytes)
+        f.write(_padding(f.tell()))
+        for data in sections:
+            f.write(data)
+            f.write(_padding(len(data)))
+    os.replace(temp_path, path)
+
+
+def _roster_sections(roster, sections):
+    """Append the role ID, person ID, name offset and name sections for roster; return its header entry."""
+    names = roster.names
+    if isinstance(names, MappedNames) and names.mapped:
+        offsets, blob = names.blob()
+        offsets = bytes(offsets) if sys.byteorder == "little" else _little_endian(array("Q", offsets))
+    else:
+        encoded = [name.encode("utf-8") for name in names]
+        offsets = array("Q", [0])
+        offsets.extend(accumulate(len(data) for data in encoded))
+        offsets = _little_endian(offsets)
+        blob = b"".join(encoded)
+    sections.extend((_little_endian(roster.role_ids), _little_endian(roster.ids), offsets, blob))
+    return {"count": len(names), "role_names": list(roster.role_names), "names_bytes": len(blob)}
+
+
+def _little_endian(column):
+    if sys.byteorder != "little":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _padding(length):
+    return b"\0" * (-length % 8)
+
+
+def _settings_to_json(settings):
+    data = dict(settings)
+    if "constraints" in data:
+        data["constraints"] = [
+            {"role": c.role, "minimum": c.minimum, "maximum": c.maximum} for c in data["constraints"]
+        ]
+    return data
+
+
+def _notice_to_json(notice):
+    return {
+        "kind": notice.kind,
+        "message": notice.message,
+        "requested": notice.requested,
+        "num_groups": notice.num_groups,
+        "role": notice.role,
+    }
+
+
+# ---------------- LOADING ----------------
+def load_session(path):
+    """Open a session file and return a Session. Raises SessionError for other files."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < len(MAGIC) + _HEADER_SIZE.size:
+            raise SessionError(f"{path} is not a Crew Maker session file.")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise SessionError(f"{path} is not a Crew Maker session file.")
+    (header_size,) = _HEADER_SIZE.unpack_from(buffer, len(MAGIC))
+    position = len(MAGIC) + _HEADER_SIZE.size
+    try:
+        header = json.loads(buffer[position:position + header_size].decode("utf-8"))
+    except ValueError as e:
+        raise SessionError(f"{path} has a damaged header: {e}")
+    if header.get("version") != VERSION:
+        raise SessionError(f"{path} was saved by an incompatible version of Crew Maker.")
+    reader = _SectionReader(buffer, _aligned(position + header_size), os.path.abspath(path))
+
+    roster = reader.roster(header["roster"])
+    settings = dict(header["settings"])
+    if "constraints" in settings:
+        settings["constraints"] = [RoleConstraint(**c) for c in settings["constraints"]]
+    result = None
+    saved = header.get("result")
+    if saved is not None:
+        snapshot = reader.roster(saved["roster"])
+        bounds = reader.column("Q", saved["groups"] + 1)
+        members = reader.column("I", bounds[-1])
+        groups = [members[bounds[g]:bounds[g + 1]].tolist() for g in range(saved["groups"])]
+        notices = [Notice(**notice) for notice in saved["notices"]]
+        result = GroupingResult(snapshot, groups, saved["num_groups"], notices)
+    return Session(roster, settings, result)
+
+
+def _aligned(position):
+    return position + (-position % 8)
+
+
+class _SectionReader:
+    """Reads consecutive 8-byte aligned sections from a mapped session file."""
+    def __init__(self, buffer, position, source):
+        self.buffer = buffer
+        self.position = position
+        self.source = source
+
+    def _take(self, length):
+        start = self.position
+        if start + length > len(self.buffer):
+            raise SessionError("The session file is truncated.")
+        self.position = _aligned(start + length)
+        return start
+
+    def column(self, typecode, count):
+        """Return the next section as count values of typecode (a view into the file where possible)."""
+        size = array(typecode).itemsize
+        start = self._take(count * size)
+        view = memoryview(self.buffer)[start:start + count * size]
+        if sys.byteorder == "little":
+            return view.cast(typecode)
+        column = array(typecode, view.tobytes())
+        column.byteswap()
+        return column
+
+    def roster(self, entry):
+        count = entry["count"]
+        # Role and person IDs are edited in place, so they are copied out of the file.
+        role_ids = self._copy(self.column("H", count))
+        ids = self._copy(self.column("Q", count))
+        offsets = self.column("Q", count + 1)
+        blob_start = self._take(entry["names_bytes"])
+        names = MappedNames(self.buffer, offsets, blob_start, self.source)
+        return Roster.from_columns(names, role_ids, list(entry["role_names"]), ids)
+
+    @staticmethod
+    def _copy(column):
+        if isinstance(column, array):
+            return column
+        copy = array(column.format)
+        copy.frombytes(column.cast("B"))
+        return copy